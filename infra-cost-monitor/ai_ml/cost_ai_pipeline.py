@@ -9,16 +9,27 @@ Automatically triggers alerts when anomalies are detected
 Includes cost forecasting using Prophet
 """
 
-import json
 import os
+
+# BLAS/OpenMP pools are sized when numpy and torch are first imported, so set them up front
+os.environ.setdefault('OMP_NUM_THREADS', str(os.cpu_count()))
+os.environ.setdefault('MKL_NUM_THREADS', str(os.cpu_count()))
+
+import json
+import hashlib
 import logging
+import sqlite3
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from typing import Dict, List, Any
+import numpy as np
+import pandas as pd
 from sentence_transformers import SentenceTransformer
 
 # Add alert system to path
 sys.path.append('../alert_system')
-from alert_manager import AlertManager, AlertConfig
+from alert_manager import AlertManager, AlertConfig, read_json
 
 # Add forecasts to path
 sys.path.append('./forecasts')
@@ -40,9 +51,120 @@ except (ImportError, RuntimeError) as e:
 
 CHROMA_IMPORTED = CHROMA_AVAILABLE
 
+# Try to import ONNX Runtime for the faster MiniLM backend, but make it optional
+ONNX_AVAILABLE = False
+try:
+    import onnxruntime as ort
+    from transformers import AutoTokenizer
+    ONNX_AVAILABLE = True
+except ImportError as e:
+    logger.info(f"ONNX Runtime not available, using SentenceTransformer: {e}")
+    ONNX_AVAILABLE = False
+
+# Run MiniLM on the GPU when one is available
+try:
+    import torch
+    TORCH_DEVICE = 'cuda' if torch.cuda.is_available() else 'cpu'
+    torch.set_num_threads(os.cpu_count())
+    try:
+        # One inter-op thread avoids oversubscribing cores alongside the parallel forecast fits
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Can only be set before any inter-op parallel work has started
+        pass
+except ImportError:
+    torch = None
+    TORCH_DEVICE = 'cpu'
+
+# Directory holding the exported MiniLM ONNX model and tokenizer files
+ONNX_MODEL_DIR = os.getenv("MINILM_ONNX_DIR", "./models/all-MiniLM-L6-v2-onnx")
+
+class OnnxMiniLMEmbedding:
+    """
+    MiniLM embeddings served by ONNX Runtime instead of PyTorch
+
+    Export the model once with:
+        optimum-cli export onnx --model sentence-transformers/all-MiniLM-L6-v2 ./models/all-MiniLM-L6-v2-onnx
+    """
+
+    def __init__(self, model_dir: str = ONNX_MODEL_DIR, quantize: bool = False, batch_size: int = 64):
+        self.batch_size = batch_size
+        model_path = os.path.join(model_dir, "model.onnx")
+        if quantize:
+            model_path = self._quantize(model_path)
+        
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        providers = ['CPUExecutionProvider']
+        if 'CUDAExecutionProvider' in ort.get_available_providers():
+            providers.insert(0, 'CUDAExecutionProvider')
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=providers)
+        self.name = "onnx-all-MiniLM-L6-v2" + ("-int8" if quantize else "")
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.input_names = [i.name for i in self.session.get_inputs()]
+    
+    @staticmethod
+    def _quantize(model_path: str) -> str:
+        """Create (once) and return an INT8 dynamically quantized copy of the model"""
+        quantized_path = model_path.replace(".onnx", ".int8.onnx")
+        if not os.path.exists(quantized_path):
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+            quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+        return quantized_path
+    
+    def __call__(self, input):
+        # Handle both single strings and lists of strings
+        texts = [input] if isinstance(input, str) else list(input)
+        if not texts:
+            return []
+        
+        # Smart batching: group texts of similar length so batches carry little padding,
+        # then scatter the results back into the original order
+        order = np.argsort([len(t) for t in texts], kind='stable')
+        embeddings = None
+        for start in range(0, len(order), self.batch_size):
+            batch_idx = order[start:start + self.batch_size]
+            batch_emb = self._encode_batch([texts[i] for i in batch_idx])
+            if embeddings is None:
+                embeddings = np.empty((len(texts), batch_emb.shape[1]), dtype=np.float32)
+            embeddings[batch_idx] = batch_emb
+        
+        return embeddings.tolist()
+    
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        """Run one padded batch through the model"""
+        encoded = self.tokenizer(texts, padding=True, truncation=True, max_length=256, return_tensors='np')
+        feeds = {name: encoded[name].astype(np.int64) for name in self.input_names}
+        hidden = self.session.run(None, feeds)[0]
+        
+        # Mean pooling over real tokens, then L2 normalization (matches sentence-transformers)
+        mask = encoded['attention_mask'].astype(np.float32)
+        embeddings = np.einsum('bsd,bs->bd', hidden, mask) / np.clip(mask.sum(1, keepdims=True), 1e-9, None)
+        embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings
+
+@lru_cache(maxsize=1)
+def _get_st_model(name: str = 'all-MiniLM-L6-v2') -> SentenceTransformer:
+    """Load the SentenceTransformer model once per process"""
+    model = SentenceTransformer(name, device=TORCH_DEVICE)
+    if TORCH_DEVICE == 'cuda':
+        # fp16 on tensor cores; some older GPUs lack fp16 kernels for the pooling ops
+        try:
+            model.half()
+        except Exception as e:
+            logger.warning(f"fp16 not supported on this GPU, keeping fp32: {e}")
+    return model
+
 class CustomEmbeddingFunction:
-    def __init__(self):
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+    def __init__(self, model: SentenceTransformer = None, batch_size: int = 64, normalize_embeddings: bool = True):
+        # Reuse an already loaded model when given, otherwise the process-wide one
+        self.model = model or _get_st_model()
+        self.device = self.model.device.type
+        self.name = "all-MiniLM-L6-v2"
+        if next(self.model.parameters()).dtype == torch.float16:
+            self.name += "-fp16"
+        self.batch_size = batch_size
+        self.normalize_embeddings = normalize_embeddings
     
     def __call__(self, input):
         # Handle both single strings and lists of strings
@@ -51,14 +173,85 @@ class CustomEmbeddingFunction:
         else:
             texts = input
         
-        # Generate embeddings
-        embeddings = self.model.encode(texts, convert_to_tensor=False)
+        # Generate embeddings (encode() already length-sorts texts into batches internally)
+        embeddings = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            device=self.device,
+            convert_to_numpy=True,
+            normalize_embeddings=self.normalize_embeddings,
+            show_progress_bar=False
+        )
         
         # Return as list of lists
-        if isinstance(input, str):
-            return embeddings.tolist()
-        else:
-            return embeddings.tolist()
+        return embeddings.tolist()
+
+class EmbeddingCache:
+    """Persistent embedding store keyed by the SHA-256 of the input text"""
+    
+    # SQLite caps the number of bound parameters per statement
+    _QUERY_CHUNK = 500
+    
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS embeddings (sha256 BLOB PRIMARY KEY, vec BLOB)")
+        self.conn.commit()
+    
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        """Return the cached vectors for whichever keys are present"""
+        found = {}
+        for start in range(0, len(keys), self._QUERY_CHUNK):
+            chunk = keys[start:start + self._QUERY_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(f"SELECT sha256, vec FROM embeddings WHERE sha256 IN ({placeholders})", chunk)
+            for key, vec in rows:
+                found[key] = np.frombuffer(vec, dtype=np.float32)
+        return found
+    
+    def put_many(self, items: Dict[bytes, np.ndarray]):
+        """Store vectors as float32 bytes"""
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (sha256, vec) VALUES (?, ?)",
+            [(key, np.asarray(vec, dtype=np.float32).tobytes()) for key, vec in items.items()]
+        )
+        self.conn.commit()
+
+class CachedEmbeddingFunction:
+    """Wraps an embedding backend so that only texts missing from the cache get encoded"""
+    
+    def __init__(self, embedding_function, cache: EmbeddingCache):
+        self.embedding_function = embedding_function
+        self.cache = cache
+        # Vectors from different backends are not interchangeable, so namespace the keys
+        self.namespace = getattr(embedding_function, "name", type(embedding_function).__name__)
+    
+    def _key(self, text: str) -> bytes:
+        return hashlib.sha256(f"{self.namespace}\0{text}".encode()).digest()
+    
+    def __call__(self, input):
+        # Handle both single strings and lists of strings
+        texts = [input] if isinstance(input, str) else list(input)
+        if not texts:
+            return []
+        
+        keys = [self._key(t) for t in texts]
+        vectors = self.cache.get_many(list(set(keys)))
+        
+        # Encode each missing text once, even if it appears several times
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors and key not in missing:
+                missing[key] = text
+        
+        if missing:
+            encoded = self.embedding_function(list(missing.values()))
+            fresh = {key: np.asarray(vec, dtype=np.float32) for key, vec in zip(missing, encoded)}
+            self.cache.put_many(fresh)
+            vectors.update(fresh)
+            logger.info(f"Embedding cache: {len(texts) - len(missing)} hits, {len(missing)} misses")
+        
+        return [vectors[key].tolist() for key in keys]
 
 class CostAIPipeline:
     def __init__(self, output_dir: str = "../output", chroma_dir: str = "./chroma_db"):
@@ -72,27 +265,29 @@ class CostAIPipeline:
         self.output_dir = output_dir
         self.chroma_dir = chroma_dir
         
-        # Initialize embedding model (MiniLM for efficiency)
-        logger.info("Loading sentence transformer model...")
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-        
         self._chroma_available = CHROMA_IMPORTED
+        self.embedding_function = None
         # Initialize Chroma client with custom embedding function (if available)
         if self._chroma_available:
             try:
                 self.chroma_client = chromadb.PersistentClient(path=chroma_dir)
                 
-                # Create collections with custom embedding function
-                embedding_function = CustomEmbeddingFunction()
+                # Single embedding backend shared by both collections
+                self.embedding_function = self._create_embedding_function()
+                try:
+                    cache = EmbeddingCache(os.path.join(chroma_dir, "emb_cache.sqlite"))
+                    self.embedding_function = CachedEmbeddingFunction(self.embedding_function, cache)
+                except Exception as e:
+                    logger.warning(f"Embedding cache unavailable, embeddings will not be cached: {e}")
                 
                 self.cost_collection = self.chroma_client.get_or_create_collection(
                     name="cost_data",
-                    embedding_function=embedding_function
+                    embedding_function=self.embedding_function
                 )
                 
                 self.anomaly_collection = self.chroma_client.get_or_create_collection(
                     name="anomaly_data", 
-                    embedding_function=embedding_function
+                    embedding_function=self.embedding_function
                 )
                 logger.info(f"Chroma vector database initialized at {chroma_dir}")
             except Exception as e:
@@ -109,6 +304,18 @@ class CostAIPipeline:
         
         logger.info("AI/ML Pipeline initialized successfully")
     
+    def _create_embedding_function(self):
+        """Create the MiniLM embedding backend, preferring ONNX Runtime when the exported model exists"""
+        if ONNX_AVAILABLE and os.path.exists(os.path.join(ONNX_MODEL_DIR, "model.onnx")):
+            try:
+                logger.info(f"Loading ONNX MiniLM model from {ONNX_MODEL_DIR}...")
+                return OnnxMiniLMEmbedding(ONNX_MODEL_DIR)
+            except Exception as e:
+                logger.warning(f"Failed to load ONNX model, falling back to SentenceTransformer: {e}")
+        
+        logger.info("Loading sentence transformer model...")
+        return CustomEmbeddingFunction()
+    
     def _initialize_alert_manager(self) -> AlertManager:
         """Initialize alert manager with configuration"""
         try:
@@ -152,20 +359,60 @@ class CostAIPipeline:
             'composite_data': 'composite_data.json'
         }
         
+        # Read and parse the files concurrently
+        with ThreadPoolExecutor(max_workers=len(json_files)) as executor:
+            futures = {
+                key: executor.submit(read_json, os.path.join(self.output_dir, filename))
+                for key, filename in json_files.items()
+            }
+        
         for key, filename in json_files.items():
             filepath = os.path.join(self.output_dir, filename)
-            if os.path.exists(filepath):
-                try:
-                    with open(filepath, 'r') as f:
-                        data[key] = json.load(f)
-                    logger.info(f"Loaded {filename}")
-                except Exception as e:
-                    logger.error(f"Error loading {filename}: {e}")
-            else:
+            try:
+                data[key] = futures[key].result()
+                logger.info(f"Loaded {filename}")
+            except FileNotFoundError:
                 logger.warning(f"File not found: {filepath}")
+            except Exception as e:
+                logger.error(f"Error loading {filename}: {e}")
         
         return data
     
+    @staticmethod
+    def _normalize_anomalies(anomalies: List[Dict]) -> List[Dict]:
+        """Map old and new anomaly formats onto the fields the alert manager expects"""
+        return [
+            {
+                'service': a.get('service_desc') or a.get('service', 'unknown'),
+                # Use percentage_diff if present, else anomaly_score, else default to 1.0
+                'anomaly_score': a['percentage_diff'] / 100 if 'percentage_diff' in a else a.get('anomaly_score', 1.0),
+                'cost_impact': a.get('cost_impact', 0),
+                'description': a.get('description', ''),
+                'severity': a.get('severity', 'medium'),
+                'timestamp': a.get('timestamp') or a.get('detected_at', '')
+            }
+            for a in anomalies
+        ]
+    
+    @staticmethod
+    def _column(df: pd.DataFrame, name: str, default) -> pd.Series:
+        """Column values with missing entries replaced by default, like dict.get(name, default) per row"""
+        if name in df:
+            return df[name].where(df[name].notna(), default)
+        if isinstance(default, pd.Series):
+            return default
+        return pd.Series([default] * len(df), index=df.index)
+    
+    @staticmethod
+    def _format_number(series: pd.Series, fmt: str) -> pd.Series:
+        """Format a numeric column with a printf-style spec in one vectorized call"""
+        return pd.Series(np.char.mod(fmt, series.to_numpy(dtype=float)), index=series.index, dtype=object)
+    
+    @staticmethod
+    def _to_summaries(texts: pd.Series, metadata: pd.DataFrame) -> List[Dict[str, Any]]:
+        """Pair text and metadata columns into summary records"""
+        return [{'text': text, 'metadata': meta} for text, meta in zip(texts.tolist(), metadata.to_dict('records'))]
+    
     def create_cost_summaries(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Create human-readable summaries from cost data"""
         summaries = []
@@ -185,70 +432,81 @@ class CostAIPipeline:
         
         # MTD data summaries
         if 'mtd_data' in data:
-            for mtd in data['mtd_data']:
-                summaries.append({
-                    'text': f"Month-to-date cost for {mtd['month']}: ₹{mtd['cost']:.2f} over {mtd['days']} days.",
-                    'metadata': {
-                        'type': 'mtd_data',
-                        'month': mtd['month'],
-                        'cost': mtd['cost'],
-                        'days': mtd['days']
-                    }
-                })
+            df = pd.DataFrame(data['mtd_data'], columns=['month', 'cost', 'days'])
+            texts = ("Month-to-date cost for " + df['month'].astype(str) + ": ₹" + self._format_number(df['cost'], '%.2f')
+                     + " over " + df['days'].astype(str) + " days.")
+            summaries.extend(self._to_summaries(texts, df.assign(type='mtd_data')[['type', 'month', 'cost', 'days']]))
         
         # Daily cost summaries
         if 'daily_total_data' in data:
-            for daily in data['daily_total_data'][-10:]:  # Last 10 days
-                summaries.append({
-                    'text': f"Daily total cost for {daily['date']}: ₹{daily['cost']:.2f}.",
-                    'metadata': {
-                        'type': 'daily_total_data',
-                        'date': daily['date'],
-                        'cost': daily['cost']
-                    }
-                })
+            df = pd.DataFrame(data['daily_total_data'][-10:], columns=['date', 'cost'])  # Last 10 days
+            texts = "Daily total cost for " + df['date'].astype(str) + ": ₹" + self._format_number(df['cost'], '%.2f') + "."
+            summaries.extend(self._to_summaries(texts, df.assign(type='daily_total_data')[['type', 'date', 'cost']]))
         
         # Composite data summaries
         if 'composite_data' in data:
-            for composite in data['composite_data'][-20:]:  # Last 20 records
-                summaries.append({
-                    'text': f"Composite cost: {composite['service_desc']} - {composite['sku_desc']} in {composite['project_id']} ({composite['region']}) on {composite['date']}: ₹{composite['cost']:.2f}.",
-                    'metadata': {
-                        'type': 'composite_data',
-                        'service_desc': composite['service_desc'],
-                        'sku_desc': composite['sku_desc'],
-                        'project_id': composite['project_id'],
-                        'region': composite['region'],
-                        'date': composite['date'],
-                        'cost': composite['cost']
-                    }
-                })
+            columns = ['service_desc', 'sku_desc', 'project_id', 'region', 'date', 'cost']
+            df = pd.DataFrame(data['composite_data'][-20:], columns=columns)  # Last 20 records
+            texts = ("Composite cost: " + df['service_desc'].astype(str) + " - " + df['sku_desc'].astype(str)
+                     + " in " + df['project_id'].astype(str) + " (" + df['region'].astype(str) + ") on "
+                     + df['date'].astype(str) + ": ₹" + self._format_number(df['cost'], '%.2f') + ".")
+            summaries.extend(self._to_summaries(texts, df.assign(type='composite_data')[['type'] + columns]))
         
         return summaries
     
     def create_anomaly_summaries(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Create detailed summaries for anomalies"""
-        summaries = []
+        if not data.get('anomalies'):
+            return []
         
-        if 'anomalies' in data and data['anomalies'] is not None:
-            for i, anomaly in enumerate(data['anomalies']):
-                summary = {
-                    'text': f"Anomaly {i+1}: {anomaly.get('test_name', 'Anomaly')}. {anomaly.get('description', 'No description')} Cost impact: ₹{anomaly.get('cost_impact', 0):.2f} with {anomaly.get('percentage_diff', anomaly.get('anomaly_score', 0)*100):.1f}% difference. Severity: {anomaly.get('severity', 'medium')}.",
-                    'metadata': {
-                        'type': 'anomaly',
-                        'test_name': anomaly.get('test_name', ''),
-                        'description': anomaly.get('description', ''),
-                        'cost_impact': anomaly.get('cost_impact', 0),
-                        'percentage_diff': anomaly.get('percentage_diff', anomaly.get('anomaly_score', 0)*100),
-                        'severity': anomaly.get('severity', 'medium'),
-                        'timestamp': anomaly.get('timestamp', ''),
-                        'composite_key': anomaly.get('composite_key', ''),
-                        'service': anomaly.get('service', anomaly.get('service_desc', 'unknown'))
-                    }
-                }
-                summaries.append(summary)
+        df = pd.DataFrame(data['anomalies'])
+        col = lambda name, default: self._column(df, name, default)
         
-        return summaries
+        # Support both old and new formats
+        test_name = col('test_name', '')
+        description = col('description', '')
+        cost_impact = col('cost_impact', 0)
+        percentage_diff = col('percentage_diff', col('anomaly_score', 0).astype(float) * 100)
+        severity = col('severity', 'medium')
+        
+        texts = ("Anomaly " + pd.Series(np.arange(1, len(df) + 1), index=df.index).astype(str) + ": "
+                 + col('test_name', 'Anomaly').astype(str) + ". "
+                 + col('description', 'No description').astype(str)
+                 + " Cost impact: ₹" + self._format_number(cost_impact, '%.2f')
+                 + " with " + self._format_number(percentage_diff, '%.1f') + "% difference. Severity: "
+                 + severity.astype(str) + ".")
+        
+        metadata = pd.DataFrame({
+            'type': 'anomaly',
+            'test_name': test_name,
+            'description': description,
+            'cost_impact': cost_impact,
+            'percentage_diff': percentage_diff,
+            'severity': severity,
+            'timestamp': col('timestamp', ''),
+            'composite_key': col('composite_key', ''),
+            'service': col('service', col('service_desc', 'unknown'))
+        }, index=df.index)
+        
+        return self._to_summaries(texts, metadata)
+    
+    # Documents embedded and upserted per Chroma call
+    _UPSERT_BATCH_SIZE = 512
+    
+    @staticmethod
+    def _prepare_documents(summaries: List[Dict]) -> tuple:
+        """Return (ids, texts, metadatas) with content-hash IDs, dropping duplicate texts"""
+        ids, texts, metadatas = [], [], []
+        seen = set()
+        for s in summaries:
+            doc_id = hashlib.sha1(s['text'].encode()).hexdigest()
+            if doc_id in seen:
+                continue
+            seen.add(doc_id)
+            ids.append(doc_id)
+            texts.append(s['text'])
+            metadatas.append(s['metadata'])
+        return ids, texts, metadatas
     
     def store_in_chroma(self, cost_summaries: List[Dict], anomaly_summaries: List[Dict]):
         """Store summaries in Chroma vector database"""
@@ -258,31 +516,41 @@ class CostAIPipeline:
 
         logger.info("Storing data in Chroma vector database...")
         
-        # Store cost data
-        if cost_summaries:
-            texts = [s['text'] for s in cost_summaries]
-            metadatas = [s['metadata'] for s in cost_summaries]
-            ids = [f"cost_{i}" for i in range(len(cost_summaries))]
+        # IDs are derived from the document text, so re-runs update existing entries instead of
+        # duplicating them, and embeddings are passed in so Chroma does not re-run the model
+        cost_ids, cost_texts, cost_metadatas = self._prepare_documents(cost_summaries)
+        anomaly_ids, anomaly_texts, anomaly_metadatas = self._prepare_documents(anomaly_summaries)
+        
+        # Embed and upsert in bounded batches to cap memory use. Cost and anomaly documents are
+        # embedded together as one stream; each batch is split at the boundary between them
+        n_cost = len(cost_texts)
+        all_texts = cost_texts + anomaly_texts
+        for start in range(0, len(all_texts), self._UPSERT_BATCH_SIZE):
+            end = min(start + self._UPSERT_BATCH_SIZE, len(all_texts))
+            embeddings = self.embedding_function(all_texts[start:end])
+            split = max(0, min(end, n_cost) - start)
             
-            self.cost_collection.add(
-                documents=texts,
-                metadatas=metadatas,
-                ids=ids
-            )
-            logger.info(f"Stored {len(cost_summaries)} cost summaries")
-        
-        # Store anomalies
-        if anomaly_summaries:
-            texts = [s['text'] for s in anomaly_summaries]
-            metadatas = [s['metadata'] for s in anomaly_summaries]
-            ids = [f"anomaly_{i}" for i in range(len(anomaly_summaries))]
+            # Store cost data
+            if split > 0:
+                self.cost_collection.upsert(
+                    documents=cost_texts[start:start + split],
+                    metadatas=cost_metadatas[start:start + split],
+                    ids=cost_ids[start:start + split],
+                    embeddings=embeddings[:split]
+                )
             
-            self.anomaly_collection.add(
-                documents=texts,
-                metadatas=metadatas,
-                ids=ids
-            )
-            logger.info(f"Stored {len(anomaly_summaries)} anomaly summaries")
+            # Store anomalies
+            if split < end - start:
+                a_start, a_end = start + split - n_cost, end - n_cost
+                self.anomaly_collection.upsert(
+                    documents=anomaly_texts[a_start:a_end],
+                    metadatas=anomaly_metadatas[a_start:a_end],
+                    ids=anomaly_ids[a_start:a_end],
+                    embeddings=embeddings[split:]
+                )
+        
+        logger.info(f"Stored {len(cost_ids)} cost summaries")
+        logger.info(f"Stored {len(anomaly_ids)} anomaly summaries")
     
     def run_pipeline(self):
         """Run the complete AI/ML pipeline"""
@@ -335,43 +603,19 @@ class CostAIPipeline:
         
         logger.info("Checking for anomalies and triggering alerts...")
         
-        # Check anomalies
-        if 'anomalies' in data and data['anomalies']:
-            for anomaly in data['anomalies']:
-                # Support both old and new formats
-                service = anomaly.get('service_desc') or anomaly.get('service', 'unknown')
-                # Use percentage_diff if present, else anomaly_score, else default to 1.0
-                if 'percentage_diff' in anomaly:
-                    anomaly_score = anomaly.get('percentage_diff', 100) / 100
-                elif 'anomaly_score' in anomaly:
-                    anomaly_score = anomaly.get('anomaly_score', 1.0)
-                else:
-                    anomaly_score = 1.0
-                cost_impact = anomaly.get('cost_impact', 0)
-                description = anomaly.get('description', '')
-                severity = anomaly.get('severity', 'medium')
-                timestamp = anomaly.get('timestamp') or anomaly.get('detected_at', '')
-                
-                anomaly_data = {
-                    'service': service,
-                    'anomaly_score': anomaly_score,
-                    'cost_impact': cost_impact,
-                    'description': description,
-                    'severity': severity,
-                    'timestamp': timestamp
-                }
-                
-                # Check if this anomaly should trigger an alert
-                alert = self.alert_manager.check_anomaly(anomaly_data)
-                if alert:
-                    logger.info(f"Triggering alert for anomaly: {anomaly_data['service']} - ₹{anomaly_data['cost_impact']:.2f}")
-                    success = self.alert_manager.send_alert(alert)
-                    if success:
-                        logger.info(f"✅ Alert sent successfully for {anomaly_data['service']}")
-                    else:
-                        logger.error(f"❌ Failed to send alert for {anomaly_data['service']}")
+        # Check anomalies, with old and new field names resolved once up front
+        for anomaly_data in self._normalize_anomalies(data.get('anomalies') or []):
+            # Check if this anomaly should trigger an alert
+            alert = self.alert_manager.check_anomaly(anomaly_data)
+            if alert:
+                logger.info(f"Triggering alert for anomaly: {anomaly_data['service']} - ₹{anomaly_data['cost_impact']:.2f}")
+                success = self.alert_manager.send_alert(alert)
+                if success:
+                    logger.info(f"✅ Alert queued for {anomaly_data['service']}")
                 else:
-                    logger.info(f"No alert triggered for {anomaly_data['service']} (below threshold)")
+                    logger.error(f"❌ Alert not queued for {anomaly_data['service']}")
+            else:
+                logger.info(f"No alert triggered for {anomaly_data['service']} (below threshold)")
         
         # Check for cost spikes in daily data
         if 'daily_total_data' in data and len(data['daily_total_data']) >= 2:
@@ -391,9 +635,9 @@ class CostAIPipeline:
                     logger.info(f"Triggering cost spike alert: ₹{current_cost:.2f} vs ₹{previous_cost:.2f}")
                     success = self.alert_manager.send_alert(alert)
                     if success:
-                        logger.info("✅ Cost spike alert sent successfully")
+                        logger.info("✅ Cost spike alert queued")
                     else:
-                        logger.error("❌ Failed to send cost spike alert")
+                        logger.error("❌ Cost spike alert not queued")
 
 def main():
     """Main function to run the pipeline"""
@@ -7,32 +7,54 @@ Provides time-series forecasting for infrastructure costs
 
 import json
 import os
+import sys
+import hashlib
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Any
 import pandas as pd
 import numpy as np
 from prophet import Prophet
+from prophet.serialize import model_to_json, model_from_json
 import matplotlib.pyplot as plt
 
+# Shared JSON helpers (orjson when installed)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'common'))
+from json_utils import read_json, write_json
+
+# Fit services in parallel worker processes when joblib is installed
+try:
+    from joblib import Parallel, delayed
+    JOBLIB_AVAILABLE = True
+except ImportError:
+    JOBLIB_AVAILABLE = False
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def _slug(name: str) -> str:
+    """File-name safe slug for a service name (e.g. 'Pub/Sub' -> 'pub_sub')"""
+    return name.lower().replace(' ', '_').replace('/', '_')
+
 class CostForecaster:
-    def __init__(self, output_dir: str = "../output", forecasts_dir: str = "./forecasts"):
+    def __init__(self, output_dir: str = "../output", forecasts_dir: str = "./forecasts",
+                 max_history_days: int = 365):
         """
         Initialize the cost forecaster
         
         Args:
             output_dir: Directory containing JSON files from Go framework
             forecasts_dir: Directory to save forecast results
+            max_history_days: Most recent days of history fed to Prophet (0 for all)
         """
         self.output_dir = output_dir
         self.forecasts_dir = forecasts_dir
+        self.max_history_days = max_history_days
+        self.models_dir = os.path.join(forecasts_dir, "models")
         
-        # Create forecasts directory
-        os.makedirs(forecasts_dir, exist_ok=True)
+        # Create forecasts and fitted model cache directories
+        os.makedirs(self.models_dir, exist_ok=True)
         
         logger.info("Cost Forecaster initialized")
     
@@ -45,8 +67,7 @@ class CostForecaster:
                 logger.error(f"Daily data file not found: {daily_file}")
                 return pd.DataFrame()
             
-            with open(daily_file, 'r') as f:
-                daily_data = json.load(f)
+            daily_data = read_json(daily_file)
             
             # Convert to DataFrame
             df = pd.DataFrame(daily_data)
@@ -75,25 +96,21 @@ class CostForecaster:
                 logger.warning("Composite data file not found, skipping service forecasts")
                 return {}
             
-            with open(composite_file, 'r') as f:
-                composite_data = json.load(f)
+            composite_data = read_json(composite_file)
             
-            # Group by service
-            service_forecasts = {}
+            # Aggregate daily costs per service in a single groupby using ALL available data
+            df = pd.DataFrame(composite_data)
+            df['date'] = pd.to_datetime(df['date'])
+            agg = df.groupby(['service_desc', 'date'])['cost'].sum().reset_index()
             
-            for service in set(item['service_desc'] for item in composite_data):
-                service_data = [item for item in composite_data if item['service_desc'] == service]
-                
-                # Aggregate daily costs by service using ALL available data
-                df_service = pd.DataFrame(service_data)
-                df_service['date'] = pd.to_datetime(df_service['date'])
-                daily_service_costs = df_service.groupby('date')['cost'].sum().reset_index()
-                daily_service_costs = daily_service_costs.rename(columns={'date': 'ds', 'cost': 'y'})
-                
-                if len(daily_service_costs) >= 7:  # Need at least 7 days for forecasting
-                    service_forecasts[service] = daily_service_costs
-                    logger.info(f"Prepared forecast data for {service}: {len(daily_service_costs)} days")
-                    logger.info(f"  Date range: {daily_service_costs['ds'].min()} to {daily_service_costs['ds'].max()}")
+            service_forecasts = {}
+            for service, group in agg.groupby('service_desc', sort=False):
+                if len(group) < 7:  # Need at least 7 days for forecasting
+                    continue
+                daily_service_costs = group.rename(columns={'date': 'ds', 'cost': 'y'})[['ds', 'y']].reset_index(drop=True)
+                service_forecasts[service] = daily_service_costs
+                logger.info(f"Prepared forecast data for {service}: {len(daily_service_costs)} days")
+                logger.info(f"  Date range: {daily_service_costs['ds'].min()} to {daily_service_costs['ds'].max()}")
             
             return service_forecasts
             
@@ -116,43 +133,62 @@ class CostForecaster:
         try:
             logger.info(f"Running forecast for {service_name} ({periods} days)")
             
-            # Initialize Prophet model with settings optimized for 1 year of data
-            model = Prophet(
-                yearly_seasonality=True,      # Capture yearly patterns
+            # Stan fit cost grows with the series length; recent points dominate
+            # the trend for a 30-day horizon, so older history is dropped
+            if self.max_history_days and len(df) > self.max_history_days:
+                df = df.tail(self.max_history_days)
+            
+            # Prophet settings optimized for 1 year of data
+            model_params = dict(
+                yearly_seasonality=len(df) >= 365,  # Capture yearly patterns once a full year is available
                 weekly_seasonality=True,      # Capture weekly patterns  
                 daily_seasonality=False,      # Too granular for cost data
                 seasonality_mode='multiplicative',  # Better for cost data
                 changepoint_prior_scale=0.05,  # Allow for trend changes
-                seasonality_prior_scale=10.0   # Allow seasonality to vary
+                seasonality_prior_scale=10.0,  # Allow seasonality to vary
+                n_changepoints=10,            # Fewer trend changepoints to optimize
+                uncertainty_samples=100,      # Interval resampling dominates predict time
+                stan_backend='CMDSTANPY'
             )
             
-            # Fit the model
-            model.fit(df)
+            # Reuse the fitted model from a previous run if the series and settings are unchanged
+            slug = _slug(service_name)
+            series_hash = self._series_hash(df, model_params)
+            model = self._load_cached_model(slug, series_hash)
+            if model is None:
+                model = Prophet(**model_params)
+                model.fit(df)
+                self._save_model(model, slug, series_hash)
+            else:
+                logger.info(f"Reusing cached model for {service_name}")
             
             # Create future dataframe
             future = model.make_future_dataframe(periods=periods)
             
             # Make forecast
             forecast = model.predict(future)
+            if 'yearly' not in forecast:
+                # No yearly component when the series is shorter than a year
+                forecast['yearly'] = 0.0
             
-            # Extract forecast components
+            # Extract forecast components from a single slice of the forecast horizon
+            tail = forecast.iloc[-periods:]
             forecast_result = {
                 'service': service_name,
-                'forecast_dates': forecast['ds'].tail(periods).dt.strftime('%Y-%m-%d').tolist(),
-                'forecast_values': forecast['yhat'].tail(periods).tolist(),
-                'forecast_lower': forecast['yhat_lower'].tail(periods).tolist(),
-                'forecast_upper': forecast['yhat_upper'].tail(periods).tolist(),
-                'trend': forecast['trend'].tail(periods).tolist(),
-                'seasonal': forecast['yearly'].tail(periods).tolist(),
+                'forecast_dates': tail['ds'].to_numpy().astype('datetime64[D]').astype(str).tolist(),
+                'forecast_values': tail['yhat'].to_numpy(),
+                'forecast_lower': tail['yhat_lower'].to_numpy(),
+                'forecast_upper': tail['yhat_upper'].to_numpy(),
+                'trend': tail['trend'].to_numpy(),
+                'seasonal': tail['yearly'].to_numpy(),
                 'last_actual_date': df['ds'].max().strftime('%Y-%m-%d'),
                 'last_actual_value': float(df['y'].iloc[-1]),
                 'forecast_periods': periods
             }
             
             # Save forecast to file
-            forecast_file = os.path.join(self.forecasts_dir, f"{service_name.lower().replace(' ', '_')}_forecast.json")
-            with open(forecast_file, 'w') as f:
-                json.dump(forecast_result, f, indent=2)
+            forecast_file = os.path.join(self.forecasts_dir, f"{slug}_forecast.json")
+            write_json(forecast_file, forecast_result, indent=True)
             
             logger.info(f"Forecast completed for {service_name}")
             return forecast_result
@@ -161,6 +197,40 @@ class CostForecaster:
             logger.error(f"Error running forecast for {service_name}: {e}")
             return {}
     
+    @staticmethod
+    def _series_hash(df: pd.DataFrame, model_params: Dict[str, Any]) -> str:
+        """Hash of the training series and model settings, used to key cached models"""
+        h = hashlib.md5(pd.util.hash_pandas_object(df[['ds', 'y']], index=False).values.tobytes())
+        h.update(json.dumps(model_params, sort_keys=True).encode())
+        return h.hexdigest()
+    
+    def _load_cached_model(self, slug: str, series_hash: str):
+        """Load a previously fitted model if its sidecar hash matches, else None"""
+        model_file = os.path.join(self.models_dir, f"model_{slug}.json")
+        hash_file = os.path.join(self.models_dir, f"model_{slug}.hash")
+        try:
+            with open(hash_file, 'r') as f:
+                if f.read().strip() != series_hash:
+                    return None
+            with open(model_file, 'r') as f:
+                return model_from_json(f.read())
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Could not load cached model {model_file}: {e}")
+            return None
+    
+    def _save_model(self, model: Prophet, slug: str, series_hash: str):
+        """Persist a fitted model and the hash of the series it was fitted on"""
+        try:
+            with open(os.path.join(self.models_dir, f"model_{slug}.json"), 'w') as f:
+                f.write(model_to_json(model))
+            # Written last so a partially saved model is never picked up
+            with open(os.path.join(self.models_dir, f"model_{slug}.hash"), 'w') as f:
+                f.write(series_hash)
+        except Exception as e:
+            logger.warning(f"Could not cache model for {slug}: {e}")
+    
     def run_all_forecasts(self, forecast_days: int = 30) -> Dict[str, Any]:
         """Run forecasts for total costs and individual services"""
         logger.info("Starting cost forecasting pipeline...")
@@ -177,25 +247,33 @@ class CostForecaster:
             results['total_cost_forecast'] = self.run_forecast(df_total, forecast_days, "Total Cost")
         
         # Service-level forecasts
+        # Each Prophet fit is an independent Stan optimization, so services are
+        # fitted in separate processes (loky) to avoid the GIL and Stan re-entrancy
         service_data = self.create_service_forecasts()
-        for service, df_service in service_data.items():
-            forecast_result = self.run_forecast(df_service, forecast_days, service)
-            if forecast_result:
-                results['service_forecasts'][service] = forecast_result
+        if JOBLIB_AVAILABLE and len(service_data) > 1:
+            results_list = Parallel(n_jobs=-1, backend='loky')(
+                delayed(self.run_forecast)(df_service, forecast_days, service)
+                for service, df_service in service_data.items()
+            )
+        else:
+            results_list = [
+                self.run_forecast(df_service, forecast_days, service)
+                for service, df_service in service_data.items()
+            ]
+        results['service_forecasts'] = {r['service']: r for r in results_list if r}
         
         # Create summary
         results['summary'] = {
             'total_services_forecasted': len(results['service_forecasts']),
             'forecast_days': forecast_days,
             'forecast_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'total_forecast_value': sum(results['total_cost_forecast'].get('forecast_values', [])),
+            'total_forecast_value': float(np.sum(results['total_cost_forecast'].get('forecast_values', []))),
             'services': list(results['service_forecasts'].keys())
         }
         
         # Save summary
         summary_file = os.path.join(self.forecasts_dir, "forecast_summary.json")
-        with open(summary_file, 'w') as f:
-            json.dump(results['summary'], f, indent=2)
+        write_json(summary_file, results['summary'], indent=True)
         
         logger.info("Cost forecasting pipeline completed!")
         return results
@@ -207,7 +285,7 @@ class CostForecaster:
         total_forecast = forecast_results.get('total_cost_forecast', {})
         if total_forecast:
             # Calculate trend
-            forecast_values = total_forecast.get('forecast_values', [])
+            forecast_values = np.asarray(total_forecast.get('forecast_values', []), dtype=float)
             if len(forecast_values) >= 2:
                 trend = (forecast_values[-1] - forecast_values[0]) / forecast_values[0] * 100
                 
@@ -219,8 +297,8 @@ class CostForecaster:
                     insights.append(f"➡️ Cost trend is relatively stable with {trend:.1f}% change")
             
             # Peak prediction
-            max_forecast = max(forecast_values) if forecast_values else 0
-            max_date_idx = forecast_values.index(max_forecast) if forecast_values else 0
+            max_date_idx = int(forecast_values.argmax()) if len(forecast_values) else 0
+            max_forecast = float(forecast_values[max_date_idx]) if len(forecast_values) else 0
             max_date = total_forecast.get('forecast_dates', [])[max_date_idx] if total_forecast.get('forecast_dates') else ""
             
             insights.append(f"🎯 Predicted peak cost: ₹{max_forecast:.2f} on {max_date}")
@@ -228,20 +306,17 @@ class CostForecaster:
         # Service insights
         service_forecasts = forecast_results.get('service_forecasts', {})
         if service_forecasts:
-            # Find fastest growing service
-            max_growth_service = None
-            max_growth = 0
-            
-            for service, forecast in service_forecasts.items():
-                values = forecast.get('forecast_values', [])
-                if len(values) >= 2:
-                    growth = (values[-1] - values[0]) / values[0] * 100
-                    if growth > max_growth:
-                        max_growth = growth
-                        max_growth_service = service
-            
-            if max_growth_service:
-                insights.append(f"🚀 {max_growth_service} shows the highest growth trend: {max_growth:.1f}%")
+            # Find fastest growing service from the first and last forecast value of each;
+            # services starting at or below zero have no meaningful growth percentage
+            names = [service for service, forecast in service_forecasts.items()
+                     if len(forecast.get('forecast_values', [])) >= 2 and forecast['forecast_values'][0] > 0]
+            if names:
+                vals = np.array([[service_forecasts[n]['forecast_values'][0], service_forecasts[n]['forecast_values'][-1]]
+                                 for n in names], dtype=float)
+                growth = (vals[:, 1] - vals[:, 0]) / vals[:, 0] * 100
+                k = int(growth.argmax())
+                if growth[k] > 0:
+                    insights.append(f"🚀 {names[k]} shows the highest growth trend: {growth[k]:.1f}%")
         
         return insights
 
@@ -7,17 +7,39 @@ Handles real-time notifications via Slack and Email with escalation policies
 
 import os
 import json
+import asyncio
+import atexit
+import hashlib
+import queue
+import signal
 import logging
 import smtplib
+import sys
+import threading
 import time
-from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
-from dataclasses import dataclass
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from collections import Counter, OrderedDict, defaultdict, deque
+from datetime import datetime
+from typing import Callable, Dict, List, Any, Optional, Tuple
+from dataclasses import dataclass, field
+from email.message import EmailMessage
+from pathlib import Path
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
 
+# Shared JSON helpers (orjson when installed)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from json_utils import dumps as _dumps, read_json
+
+# Use httpx for concurrent delivery to several Slack webhooks when installed
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
 # Load environment variables
 load_dotenv()
 
@@ -25,7 +47,80 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-@dataclass
+# Alert message templates per alert type, filled with str.format_map
+SLACK_TEMPLATES = {
+    'cost_spike': """{emoji} *Cost Spike Alert*
+*Service:* {service}
+*Current Cost:* ₹{current_cost:.2f}
+*Previous Cost:* ₹{previous_cost:.2f}
+*Increase:* ₹{increase_amount:.2f} ({increase_percentage:.1f}%)
+*Threshold:* ₹{threshold_amount:.2f} / {threshold_percentage:.1f}%
+*Time:* {timestamp}""",
+    'budget_exceeded': """🚨 *Budget Exceeded Alert*
+*Service:* {service}
+*Current Cost:* ₹{current_cost:.2f}
+*Budget Limit:* ₹{budget_limit:.2f}
+*Exceeded By:* ₹{exceeded_amount:.2f}
+*Time:* {timestamp}""",
+    'anomaly': """{emoji} *Anomaly Detected*
+*Service:* {service}
+*Anomaly Score:* {anomaly_score:.2f}
+*Cost Impact:* ₹{cost_impact:.2f}
+*Time:* {timestamp}""",
+    'generic': """⚠️ *Alert: {title}*
+*Service:* {service}
+*Details:* {details}
+*Time:* {timestamp}""",
+}
+
+EMAIL_TEMPLATES = {
+    'cost_spike': """GCP Cost Spike Alert
+
+Service: {service}
+Current Cost: ₹{current_cost:.2f}
+Previous Cost: ₹{previous_cost:.2f}
+Increase: ₹{increase_amount:.2f} ({increase_percentage:.1f}%)
+Threshold: ₹{threshold_amount:.2f} / {threshold_percentage:.1f}%
+Time: {timestamp}
+
+Please review your GCP costs immediately.""",
+    'budget_exceeded': """GCP Budget Exceeded Alert
+
+Service: {service}
+Current Cost: ₹{current_cost:.2f}
+Budget Limit: ₹{budget_limit:.2f}
+Exceeded By: ₹{exceeded_amount:.2f}
+Time: {timestamp}
+
+URGENT: Budget limit has been exceeded!""",
+    'anomaly': """GCP Anomaly Alert
+
+Service: {service}
+Anomaly Score: {anomaly_score:.2f}
+Cost Impact: ₹{cost_impact:.2f}
+Time: {timestamp}
+
+Anomalous cost pattern detected.""",
+    'generic': """GCP Alert: {title}
+
+Service: {service}
+Details: {details}
+Time: {timestamp}""",
+}
+
+# infra-cost-monitor/data, resolved from this file so every script uses the same files whatever its cwd
+_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+
+# Append-only JSON Lines log of delivered alerts
+ALERT_HISTORY_FILE = os.path.join(_DATA_DIR, 'alert_history.jsonl')
+
+# Cooldown and deduplication state, persisted so restarts don't re-send recent alerts
+ALERT_STATE_FILE = os.path.join(_DATA_DIR, 'alert_state.json')
+
+# Per-thread cached SMTP connection, so consecutive alerts skip the TCP/TLS/auth handshake
+_smtp_local = threading.local()
+
+@dataclass(frozen=True, slots=True)
 class AlertThreshold:
     """Alert threshold configuration"""
     service: str
@@ -34,7 +129,7 @@ class AlertThreshold:
     time_window_hours: int
     alert_type: str  # 'cost_spike', 'anomaly', 'budget_exceeded'
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class AlertConfig:
     """Alert configuration"""
     slack_webhook_url: str
@@ -46,18 +141,112 @@ class AlertConfig:
     escalation_recipients: List[str]
     alert_cooldown_minutes: int = 30
     max_alerts_per_hour: int = 10
+    history_size: int = 10_000  # Alerts kept in memory for history/stats queries
+    dedup_window_seconds: Optional[int] = None  # Identical (type, service, severity) alerts are sent once per window; defaults to the cooldown
+    additional_slack_webhook_urls: List[str] = field(default_factory=list)  # Extra channels that get every alert
+
+class SentAlertCache:
+    """
+    (service, timestamp) pairs already alerted on for one anomalies file, keyed by
+    the file's SHA-1 so re-running on unchanged input sends nothing twice
+    """
+    
+    def __init__(self, anomalies_file: str, cache_dir: str = '.alerts_cache'):
+        key = hashlib.sha1(Path(anomalies_file).read_bytes()).hexdigest()
+        self.path = Path(cache_dir) / f"{key}.json"
+        self.sent = set()
+        if self.path.exists():
+            try:
+                self.sent = set(map(tuple, read_json(self.path)))
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable alert cache {self.path}: {e}")
+    
+    def __contains__(self, pair: Tuple[str, str]) -> bool:
+        return pair in self.sent
+    
+    def add(self, pair: Tuple[str, str]):
+        self.sent.add(pair)
+    
+    def save(self):
+        """Write the pairs to the cache file, replacing it atomically"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.path.with_suffix('.tmp')
+        tmp_file.write_bytes(_dumps(sorted(self.sent)))
+        os.replace(tmp_file, self.path)
 
 class AlertManager:
     """Production-ready alert manager with escalation policies"""
     
-    def __init__(self, config: AlertConfig):
+    # Minimum spacing between deliveries (Slack webhooks allow ~1 message per second)
+    _SEND_INTERVAL_SECONDS = 1.0
+    # History log writes between fsyncs
+    _FSYNC_EVERY = 100
+    # Alert fingerprints remembered for deduplication
+    _DEDUP_CAPACITY = 4096
+    # Alerts arriving within this window are coalesced into one Slack message
+    _BATCH_WINDOW_SECONDS = 0.5
+    # Slack allows 50 blocks per message; one is used for the header
+    _MAX_BATCH_SIZE = 45
+    # Accepted alerts between state checkpoints
+    _CHECKPOINT_EVERY = 10
+    
+    def __init__(self, config: AlertConfig, num_workers: int = 1):
         self.config = config
-        self.alert_history: List[Dict] = []
-        self.last_alert_time: Dict[str, datetime] = {}
-        self.alert_count_hourly: Dict[str, int] = {}
+        # Bounded, time-ordered history: the oldest alerts are evicted in O(1)
+        self.alert_history: deque = deque(maxlen=config.history_size)
+        self.last_alert_time: Dict[str, float] = {}  # alert key -> epoch seconds of the last accepted alert
+        
+        # Token bucket for max_alerts_per_hour, refilled continuously instead of per clock hour
+        self._rate_capacity = float(config.max_alerts_per_hour)
+        self._rate_per_second = config.max_alerts_per_hour / 3600.0
+        self._tokens = self._rate_capacity
+        self._tokens_updated = time.monotonic()
+        
+        # Alert fingerprint -> last sent time, oldest first
+        self._dedup: "OrderedDict[str, float]" = OrderedDict()
+        self._dedup_window = (config.dedup_window_seconds if config.dedup_window_seconds is not None
+                              else config.alert_cooldown_minutes * 60)
+        
+        # Restore cooldowns and fingerprints from the previous run
+        self._state_lock = threading.Lock()
+        self._records_since_checkpoint = 0
+        self._load_state()
         
         # Load alert thresholds
         self.thresholds = self._load_thresholds()
+        self._by_key = self._index_thresholds(self.thresholds)
+        
+        # Recipient header is the same for every email
+        self._email_to = ', '.join(config.email_recipients)
+        
+        # Pooled keep-alive HTTP session for Slack, with backoff on 429/5xx responses
+        self._http = self._create_http_session()
+        
+        # With several webhooks, post to all of them concurrently from an asyncio loop thread
+        self._slack_urls = [url for url in [config.slack_webhook_url, *config.additional_slack_webhook_urls] if url]
+        self._loop = None
+        self._async_client = None
+        if HTTPX_AVAILABLE and len(self._slack_urls) > 1:
+            self._start_async_client()
+        
+        # Alerts are delivered by background workers so callers never block on Slack/SMTP
+        self._queue: queue.Queue = queue.Queue(maxsize=10_000)
+        self._history_lock = threading.Lock()
+        # id(alert) -> callback run once that alert is delivered; kept off the alert so it stays serializable
+        self._delivery_callbacks: Dict[int, Callable[[Dict], None]] = {}
+        self._history_fp = None
+        self._history_writes = 0
+        self._send_lock = threading.Lock()
+        self._next_send_time = 0.0
+        self._stopped = False
+        self._workers = [
+            threading.Thread(target=self._dispatch_loop, name=f"alert-dispatch-{i}", daemon=True)
+            for i in range(num_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+        # Safety net for callers that forget shutdown(); unregistered once it has run
+        atexit.register(self.shutdown)
         
         logger.info("Alert Manager initialized")
     
@@ -89,16 +278,45 @@ class AlertManager:
         
         # Load from file if exists
         thresholds_file = "../config/alert_thresholds.json"
-        if os.path.exists(thresholds_file):
-            try:
-                with open(thresholds_file, 'r') as f:
-                    data = json.load(f)
-                    return [AlertThreshold(**t) for t in data]
-            except Exception as e:
-                logger.error(f"Error loading thresholds: {e}")
+        try:
+            with open(thresholds_file, 'r') as f:
+                data = json.load(f)
+                return [AlertThreshold(**t) for t in data]
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"Error loading thresholds: {e}")
         
         return default_thresholds
     
+    @staticmethod
+    def _create_http_session() -> requests.Session:
+        """Create a requests session that reuses connections and retries transient failures"""
+        retry = Retry(
+            total=3,
+            backoff_factor=0.2,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=frozenset({'POST'})  # Webhook posts are not retried by default
+        )
+        session = requests.Session()
+        session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry))
+        return session
+    
+    @staticmethod
+    def _index_thresholds(thresholds: List[AlertThreshold]) -> Dict[Tuple[str, str], List[AlertThreshold]]:
+        """Index thresholds by (alert_type, service) for O(1) lookup"""
+        by_key = defaultdict(list)
+        for threshold in thresholds:
+            by_key[(threshold.alert_type, threshold.service)].append(threshold)
+        return by_key
+    
+    def _matching_thresholds(self, alert_type: str, service: str) -> List[AlertThreshold]:
+        """Thresholds of this type for the service itself, then those that apply to all services"""
+        matches = self._by_key.get((alert_type, service), [])
+        if service != "all":
+            matches = matches + self._by_key.get((alert_type, "all"), [])
+        return matches
+    
     def check_cost_spike(self, cost_data: Dict[str, Any]) -> Optional[Dict]:
         """Check for cost spikes and trigger alerts"""
         current_cost = cost_data.get('current_cost', 0)
@@ -111,28 +329,27 @@ class AlertManager:
         cost_increase = current_cost - previous_cost
         cost_increase_percentage = (cost_increase / previous_cost) * 100
         
-        for threshold in self.thresholds:
-            if (threshold.service == service or threshold.service == "all") and \
-               threshold.alert_type == "cost_spike":
+        now = time.time()
+        for threshold in self._matching_thresholds("cost_spike", service):
+            if (cost_increase >= threshold.threshold_amount or 
+                cost_increase_percentage >= threshold.threshold_percentage):
+                
+                alert = {
+                    'type': 'cost_spike',
+                    'service': service,
+                    'current_cost': current_cost,
+                    'previous_cost': previous_cost,
+                    'increase_amount': cost_increase,
+                    'increase_percentage': cost_increase_percentage,
+                    'threshold_amount': threshold.threshold_amount,
+                    'threshold_percentage': threshold.threshold_percentage,
+                    'timestamp': datetime.fromtimestamp(now).isoformat(),
+                    'ts': now,  # Epoch seconds for cheap time-window comparisons
+                    'severity': 'high' if cost_increase_percentage > 100 else 'medium'
+                }
                 
-                if (cost_increase >= threshold.threshold_amount or 
-                    cost_increase_percentage >= threshold.threshold_percentage):
-                    
-                    alert = {
-                        'type': 'cost_spike',
-                        'service': service,
-                        'current_cost': current_cost,
-                        'previous_cost': previous_cost,
-                        'increase_amount': cost_increase,
-                        'increase_percentage': cost_increase_percentage,
-                        'threshold_amount': threshold.threshold_amount,
-                        'threshold_percentage': threshold.threshold_percentage,
-                        'timestamp': datetime.now().isoformat(),
-                        'severity': 'high' if cost_increase_percentage > 100 else 'medium'
-                    }
-                    
-                    if self._should_send_alert(alert):
-                        return alert
+                if self._should_send_alert(alert, now):
+                    return alert
         
         return None
     
@@ -143,22 +360,21 @@ class AlertManager:
         service = cost_data.get('service', 'unknown')
         
         if current_cost > budget_limit:
-            for threshold in self.thresholds:
-                if (threshold.service == service or threshold.service == "all") and \
-                   threshold.alert_type == "budget_exceeded":
-                    
-                    alert = {
-                        'type': 'budget_exceeded',
-                        'service': service,
-                        'current_cost': current_cost,
-                        'budget_limit': budget_limit,
-                        'exceeded_amount': current_cost - budget_limit,
-                        'timestamp': datetime.now().isoformat(),
-                        'severity': 'critical'
-                    }
-                    
-                    if self._should_send_alert(alert):
-                        return alert
+            now = time.time()
+            for threshold in self._matching_thresholds("budget_exceeded", service):
+                alert = {
+                    'type': 'budget_exceeded',
+                    'service': service,
+                    'current_cost': current_cost,
+                    'budget_limit': budget_limit,
+                    'exceeded_amount': current_cost - budget_limit,
+                    'timestamp': datetime.fromtimestamp(now).isoformat(),
+                    'ts': now,
+                    'severity': 'critical'
+                }
+                
+                if self._should_send_alert(alert, now):
+                    return alert
         
         return None
     
@@ -168,131 +384,353 @@ class AlertManager:
         service = anomaly_data.get('service', 'unknown')
         cost_impact = anomaly_data.get('cost_impact', 0)
         
-        print(f"    🔍 DEBUG: Checking anomaly for service '{service}' with cost_impact {cost_impact}")
-        print(f"    🔍 DEBUG: Found {len(self.thresholds)} thresholds")
+        logger.debug("Checking anomaly for service '%s' with cost_impact %s", service, cost_impact)
+        now = time.time()
+        if self._in_cooldown("anomaly", service, now):
+            logger.debug("Service '%s' is in cooldown, skipping threshold checks", service)
+            return None
         
-        for threshold in self.thresholds:
-            print(f"    🔍 DEBUG: Checking threshold - service: '{threshold.service}', alert_type: '{threshold.alert_type}', threshold_amount: {threshold.threshold_amount}")
+        thresholds = self._matching_thresholds("anomaly", service)
+        logger.debug("Found %d matching thresholds", len(thresholds))
+        
+        for threshold in thresholds:
+            logger.debug("Checking threshold - service: '%s', threshold_amount: %s", threshold.service, threshold.threshold_amount)
             
-            if (threshold.service == service or threshold.service == "all") and \
-               threshold.alert_type == "anomaly":
-                
-                print(f"    🔍 DEBUG: Threshold matches! Checking if {cost_impact} >= {threshold.threshold_amount}")
+            if cost_impact >= threshold.threshold_amount:
+                alert = {
+                    'type': 'anomaly',
+                    'service': service,
+                    'anomaly_score': anomaly_score,
+                    'cost_impact': cost_impact,
+                    'timestamp': datetime.fromtimestamp(now).isoformat(),
+                    'ts': now,
+                    'severity': 'high' if anomaly_score > 0.8 else 'medium'
+                }
+                logger.debug("Cost impact %s >= threshold %s, created alert: %s", cost_impact, threshold.threshold_amount, alert)
                 
-                if cost_impact >= threshold.threshold_amount:
-                    print(f"    🔍 DEBUG: Cost impact {cost_impact} >= threshold {threshold.threshold_amount} - ALERT SHOULD BE TRIGGERED!")
-                    
-                    alert = {
-                        'type': 'anomaly',
-                        'service': service,
-                        'anomaly_score': anomaly_score,
-                        'cost_impact': cost_impact,
-                        'timestamp': datetime.now().isoformat(),
-                        'severity': 'high' if anomaly_score > 0.8 else 'medium'
-                    }
-                    
-                    print(f"    🔍 DEBUG: Created alert: {alert}")
-                    
-                    if self._should_send_alert(alert):
-                        print(f"    🔍 DEBUG: Alert should be sent!")
-                        return alert
-                    else:
-                        print(f"    🔍 DEBUG: Alert blocked by cooldown/rate limiting")
-                else:
-                    print(f"    🔍 DEBUG: Cost impact {cost_impact} < threshold {threshold.threshold_amount} - no alert")
+                if self._should_send_alert(alert, now):
+                    return alert
+                logger.debug("Alert blocked by cooldown/rate limiting")
             else:
-                print(f"    🔍 DEBUG: Threshold doesn't match - service: '{threshold.service}' vs '{service}', alert_type: '{threshold.alert_type}' vs 'anomaly'")
+                logger.debug("Cost impact %s < threshold %s - no alert", cost_impact, threshold.threshold_amount)
         
-        print(f"    🔍 DEBUG: No alert triggered for this anomaly")
+        logger.debug("No alert triggered for this anomaly")
         return None
     
-    def _should_send_alert(self, alert: Dict) -> bool:
+    def check_anomalies_batch(self, anomalies: List[Dict[str, Any]]) -> List[Optional[Dict]]:
+        """
+        Check many anomalies at once; equivalent to calling check_anomaly on each
+        
+        The threshold comparison runs as one NumPy mask; only rows that clear their
+        lowest matching threshold are built into alerts and checked for cooldown.
+        Rows repeating an earlier row's service, score and cost get None.
+        
+        Returns:
+            One entry per anomaly: the alert, or None if it did not trigger
+        """
+        results: List[Optional[Dict]] = [None] * len(anomalies)
+        if not anomalies:
+            return results
+        
+        services = [anomaly.get('service', 'unknown') for anomaly in anomalies]
+        costs = np.fromiter((anomaly.get('cost_impact', 0) for anomaly in anomalies),
+                            dtype=np.float64, count=len(anomalies))
+        
+        # Any matching threshold triggers, so each row only needs its lowest one
+        lowest = {}
+        for service in set(services):
+            amounts = [t.threshold_amount for t in self._matching_thresholds("anomaly", service)]
+            lowest[service] = min(amounts) if amounts else np.inf
+        limits = np.fromiter((lowest[service] for service in services), dtype=np.float64, count=len(services))
+        
+        now = time.time()
+        timestamp = datetime.fromtimestamp(now).isoformat()
+        seen = set()
+        for i in np.flatnonzero(costs >= limits).tolist():
+            if self._in_cooldown("anomaly", services[i], now):
+                continue
+            anomaly_score = anomalies[i].get('anomaly_score', 0)
+            
+            # Repeats of the same anomaly within the batch get no alert of their own
+            fingerprint = (services[i], round(anomaly_score, 2), round(float(costs[i]), 2))
+            if fingerprint in seen:
+                continue
+            seen.add(fingerprint)
+            
+            alert = {
+                'type': 'anomaly',
+                'service': services[i],
+                'anomaly_score': anomaly_score,
+                'cost_impact': anomalies[i].get('cost_impact', 0),
+                'timestamp': timestamp,
+                'ts': now,
+                'severity': 'high' if anomaly_score > 0.8 else 'medium'
+            }
+            if self._should_send_alert(alert, now):
+                results[i] = alert
+        
+        logger.debug("%d of %d anomalies triggered alerts", sum(r is not None for r in results), len(anomalies))
+        return results
+    
+    def _in_cooldown(self, alert_type: str, service: str, now: float) -> bool:
+        """O(1) check whether this alert type for the service was accepted within the cooldown"""
+        last_time = self.last_alert_time.get(f"{alert_type}_{service}")
+        return last_time is not None and now - last_time < self.config.alert_cooldown_minutes * 60
+    
+    def _should_send_alert(self, alert: Dict, now: Optional[float] = None) -> bool:
         """Check if alert should be sent based on cooldown and rate limiting"""
-        alert_key = f"{alert['type']}_{alert['service']}"
-        now = datetime.now()
+        if now is None:
+            now = time.time()
         
         # Check cooldown
-        if alert_key in self.last_alert_time:
-            time_since_last = now - self.last_alert_time[alert_key]
-            if time_since_last.total_seconds() < self.config.alert_cooldown_minutes * 60:
-                return False
+        if self._in_cooldown(alert['type'], alert['service'], now):
+            return False
+        
+        # Check for an identical alert within the deduplication window
+        last_sent = self._dedup.get(self._fingerprint(alert))
+        if last_sent is not None and now - last_sent < self._dedup_window:
+            return False
         
         # Check rate limiting
-        hour_key = now.strftime("%Y-%m-%d-%H")
-        if hour_key not in self.alert_count_hourly:
-            self.alert_count_hourly[hour_key] = 0
+        return self._refill_tokens() >= 1
+    
+    @staticmethod
+    def _fingerprint(alert: Dict) -> str:
+        """Short stable hash identifying alerts that should be collapsed together"""
+        key = json.dumps({'type': alert['type'], 'service': alert['service'], 'severity': alert.get('severity')}, sort_keys=True)
+        return hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+    
+    def _refill_tokens(self) -> float:
+        """Add the tokens accrued since the last refill and return the current balance"""
+        now = time.monotonic()
+        self._tokens = min(self._rate_capacity, self._tokens + (now - self._tokens_updated) * self._rate_per_second)
+        self._tokens_updated = now
+        return self._tokens
+    
+    def send_alert(self, alert: Dict, on_delivered: Optional[Callable[[Dict], None]] = None) -> bool:
+        """
+        Queue alert for delivery via configured channels
+        
+        Args:
+            alert: Alert to deliver
+            on_delivered: Called from the delivery worker once every configured channel accepted
+                the alert; never called if no channel is configured or any delivery fails
+        
+        Returns:
+            True if the alert was queued, False if suppressed by cooldown/rate limiting or the queue is full
+        """
+        now = time.time()
+        if not self._should_send_alert(alert, now):
+            return False
         
-        if self.alert_count_hourly[hour_key] >= self.config.max_alerts_per_hour:
+        # Alerts built outside the check_* methods may lack the epoch timestamp
+        alert.setdefault('ts', now)
+        if on_delivered is not None:
+            self._delivery_callbacks[id(alert)] = on_delivered
+        try:
+            self._queue.put_nowait(alert)
+        except queue.Full:
+            self._delivery_callbacks.pop(id(alert), None)
+            logger.error(f"Alert queue full, dropping {alert['type']} alert for {alert.get('service', 'unknown')}")
             return False
         
+        # Update tracking at enqueue time so repeated checks respect the cooldown right away
+        self._record_sent(alert, now)
         return True
     
-    def send_alert(self, alert: Dict) -> bool:
-        """Send alert via configured channels"""
-        if not self._should_send_alert(alert):
-            return False
-        
-        # Add delay before sending to prevent rate limiting
-        time.sleep(1)
+    def _record_sent(self, alert: Dict, now: float):
+        """Update cooldown tracking and consume a rate limit token for an accepted alert"""
+        self.last_alert_time[f"{alert['type']}_{alert['service']}"] = now
+        self._refill_tokens()
+        self._tokens -= 1
+        
+        fingerprint = self._fingerprint(alert)
+        self._dedup[fingerprint] = now
+        self._dedup.move_to_end(fingerprint)
+        if len(self._dedup) > self._DEDUP_CAPACITY:
+            self._dedup.popitem(last=False)
+        
+        self._records_since_checkpoint += 1
+        if self._records_since_checkpoint >= self._CHECKPOINT_EVERY:
+            self._checkpoint_state()
+    
+    def _load_state(self):
+        """Load persisted cooldown and deduplication state, if any"""
+        try:
+            with open(ALERT_STATE_FILE, 'r') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.warning(f"Could not load alert state: {e}")
+            return
         
-        success = True
+        self.last_alert_time.update(state.get('last', {}))
+        # Saved oldest first, which keeps the LRU order intact
+        for fingerprint, sent_at in sorted(state.get('dedup', {}).items(), key=lambda item: item[1]):
+            self._dedup[fingerprint] = sent_at
+        logger.info(f"Restored alert state: {len(self.last_alert_time)} cooldowns, {len(self._dedup)} fingerprints")
+    
+    def _checkpoint_state(self):
+        """Write cooldown and deduplication entries that can still suppress alerts"""
+        now = time.time()
+        cooldown_seconds = self.config.alert_cooldown_minutes * 60
+        state = {
+            'last': {k: t for k, t in list(self.last_alert_time.items()) if now - t < cooldown_seconds},
+            'dedup': {k: t for k, t in list(self._dedup.items()) if now - t < self._dedup_window}
+        }
         
-        # Send to Slack
-        if self.config.slack_webhook_url:
+        with self._state_lock:
+            self._records_since_checkpoint = 0
             try:
-                self._send_slack_alert(alert)
+                # Write to a temporary file and rename so a crash never leaves a truncated file
+                tmp_file = ALERT_STATE_FILE + '.tmp'
+                with open(tmp_file, 'w') as f:
+                    json.dump(state, f)
+                os.replace(tmp_file, ALERT_STATE_FILE)
             except Exception as e:
-                logger.error(f"Failed to send Slack alert: {e}")
-                success = False
+                logger.error(f"Error saving alert state: {e}")
+    
+    def _dispatch_loop(self):
+        """Worker thread: deliver queued alerts in coalesced batches until a None sentinel arrives"""
+        stop = False
+        while not stop:
+            batch = []
+            alert = self._queue.get()
+            if alert is None:
+                stop = True
+            else:
+                batch.append(alert)
+            
+            # Collect whatever else arrives in a short window so bursts go out together
+            deadline = time.monotonic() + self._BATCH_WINDOW_SECONDS
+            while not stop and len(batch) < self._MAX_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    alert = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if alert is None:
+                    stop = True
+                else:
+                    batch.append(alert)
+            
+            try:
+                if batch:
+                    self._wait_for_send_slot()
+                    self._deliver_alerts(batch)
+            except Exception as e:
+                logger.error(f"Error delivering alerts: {e}")
+            finally:
+                # Undelivered alerts drop their callbacks
+                for alert in batch:
+                    self._delivery_callbacks.pop(id(alert), None)
+                for _ in range(len(batch) + stop):
+                    self._queue.task_done()
+        self.close_smtp()
+    
+    def _wait_for_send_slot(self):
+        """Sleep just long enough to keep deliveries _SEND_INTERVAL_SECONDS apart"""
+        with self._send_lock:
+            now = time.monotonic()
+            send_at = max(now, self._next_send_time)
+            self._next_send_time = send_at + self._SEND_INTERVAL_SECONDS
+        if send_at > now:
+            time.sleep(send_at - now)
+    
+    def _deliver_alerts(self, alerts: List[Dict]):
+        """Send alerts to Slack (one message per batch) and email, recording delivered ones in history"""
+        slack_ok = True
         
-        # Send to Email
-        if self.config.email_smtp_server:
+        # Send to Slack; a webhook error or non-200 response fails the whole batch
+        if self._slack_urls:
             try:
-                self._send_email_alert(alert)
+                if len(alerts) == 1:
+                    slack_ok = self._send_slack_alert(alerts[0])
+                else:
+                    slack_ok = self._send_slack_batch(alerts)
             except Exception as e:
-                logger.error(f"Failed to send email alert: {e}")
-                success = False
+                logger.error(f"Failed to send Slack alert: {e}")
+                slack_ok = False
         
-        if success:
-            # Save to history
-            self.alert_history.append(alert)
-            self._save_alert_history()
-            
-            # Update tracking
-            service = alert.get('service', 'unknown')
-            self.last_alert_time[service] = datetime.now()
+        # Alerts that reached no channel at all are kept in history but not reported as delivered
+        any_channel = bool(self._slack_urls) or bool(self.config.email_smtp_server)
+        
+        delivered = []
+        for alert in alerts:
+            success = slack_ok
             
-            # Update hourly count
-            current_hour = datetime.now().replace(minute=0, second=0, microsecond=0)
-            hour_key = current_hour.isoformat()
-            self.alert_count_hourly[hour_key] = self.alert_count_hourly.get(hour_key, 0) + 1
+            # Send to Email
+            if self.config.email_smtp_server:
+                try:
+                    self._send_email_alert(alert)
+                except Exception as e:
+                    logger.error(f"Failed to send email alert: {e}")
+                    success = False
             
-            logger.info(f"Alert sent successfully: {alert['type']} for {service}")
+            if success:
+                delivered.append(alert)
         
-        return success
+        if delivered:
+            # Save to history
+            with self._history_lock:
+                for alert in delivered:
+                    self.alert_history.append(alert)
+                    self._save_alert_history(alert)
+            
+            for alert in delivered:
+                callback = self._delivery_callbacks.pop(id(alert), None)
+                if not any_channel:
+                    continue
+                logger.info(f"Alert sent successfully: {alert['type']} for {alert.get('service', 'unknown')}")
+                if callback is not None:
+                    try:
+                        callback(alert)
+                    except Exception as e:
+                        logger.error(f"Error in alert delivery callback: {e}")
+    
+    def shutdown(self, timeout: Optional[float] = None):
+        """Deliver the remaining queued alerts and stop the workers"""
+        if self._stopped:
+            return
+        self._stopped = True
+        atexit.unregister(self.shutdown)
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join(timeout)
+        
+        self._checkpoint_state()
+        self._stop_async_client()
+        with self._history_lock:
+            if self._history_fp is not None:
+                os.fsync(self._history_fp.fileno())
+                self._history_fp.close()
+                self._history_fp = None
     
-    def _save_alert_history(self):
-        """Save alert history to file"""
+    def _save_alert_history(self, alert: Dict):
+        """Append an alert to the history log (caller holds _history_lock)"""
         try:
-            with open('../data/alert_history.json', 'w') as f:
-                json.dump(self.alert_history, f, indent=2)
+            if self._history_fp is None:
+                self._history_fp = open(ALERT_HISTORY_FILE, 'ab', buffering=0)
+            self._history_fp.write(_dumps(alert) + b'\n')
+            
+            # Each record goes straight to the OS; fsync is amortized over many writes
+            self._history_writes += 1
+            if self._history_writes % self._FSYNC_EVERY == 0:
+                os.fsync(self._history_fp.fileno())
         except Exception as e:
             logger.error(f"Error saving alert history: {e}")
     
-    def _send_slack_alert(self, alert: Dict):
-        """Send alert to Slack"""
-        if not self.config.slack_webhook_url:
-            return
+    def _send_slack_alert(self, alert: Dict) -> bool:
+        """Send alert to Slack; True if every webhook accepted it"""
+        if not self._slack_urls:
+            return False
         
         # Format message based on alert type
-        if alert['type'] == 'cost_spike':
-            message = self._format_cost_spike_slack_message(alert)
-        elif alert['type'] == 'budget_exceeded':
-            message = self._format_budget_exceeded_slack_message(alert)
-        elif alert['type'] == 'anomaly':
-            message = self._format_anomaly_slack_message(alert)
-        else:
-            message = self._format_generic_slack_message(alert)
+        message = self._format_slack_message(alert)
         
         # Send to Slack
         payload = {
@@ -300,21 +738,105 @@ class AlertManager:
             "username": "GCP Cost Monitor",
             "icon_emoji": ":warning:"
         }
+        return self._post_slack(payload, alert['service'])
+    
+    def _send_slack_batch(self, alerts: List[Dict]) -> bool:
+        """Send several alerts to Slack as one message with a section block per alert; True if every webhook accepted it"""
+        if not self._slack_urls:
+            return False
         
-        try:
-            response = requests.post(
-                self.config.slack_webhook_url,
-                json=payload,
-                timeout=10
-            )
-            
-            if response.status_code == 200:
-                logger.info(f"Slack alert sent successfully for {alert['service']}")
+        summary = f"⚠️ {len(alerts)} GCP cost alerts"
+        blocks = [{"type": "header", "text": {"type": "plain_text", "text": summary}}]
+        for alert in alerts:
+            # Section text is limited to 3000 characters
+            text = self._format_slack_message(alert)[:3000]
+            blocks.append({"type": "section", "text": {"type": "mrkdwn", "text": text}})
+        
+        payload = {
+            "text": summary,
+            "blocks": blocks,
+            "username": "GCP Cost Monitor",
+            "icon_emoji": ":warning:"
+        }
+        return self._post_slack(payload, f"{len(alerts)} alerts")
+    
+    def _post_slack(self, payload: Dict, description: str) -> bool:
+        """Post a payload to every configured Slack webhook, logging the outcome; True if all returned 200"""
+        body = _dumps(payload)
+        if self._async_client is not None:
+            # Concurrent fan-out: total latency is that of the slowest webhook, not the sum
+            future = asyncio.run_coroutine_threadsafe(self._post_slack_async(body, description), self._loop)
+            try:
+                return future.result(timeout=30)
+            except Exception as e:
+                future.cancel()
+                logger.error(f"Error sending Slack alert: {e}")
+                return False
+        
+        ok = True
+        for url in self._slack_urls:
+            try:
+                response = self._http.post(
+                    url,
+                    data=body,
+                    headers={'Content-Type': 'application/json'},
+                    timeout=10
+                )
+                ok = self._log_slack_response(response.status_code, response.text, description) and ok
+            except Exception as e:
+                logger.error(f"Error sending Slack alert: {e}")
+                ok = False
+        return ok
+    
+    async def _post_slack_async(self, body: bytes, description: str) -> bool:
+        """Post the same body to all webhooks concurrently; True if all returned 200"""
+        responses = await asyncio.gather(
+            *(self._async_client.post(url, content=body, headers={'Content-Type': 'application/json'})
+              for url in self._slack_urls),
+            return_exceptions=True
+        )
+        ok = True
+        for response in responses:
+            if isinstance(response, Exception):
+                logger.error(f"Error sending Slack alert: {response}")
+                ok = False
             else:
-                logger.error(f"Slack webhook failed: {response.status_code} - {response.text}")
-                
+                ok = self._log_slack_response(response.status_code, response.text, description) and ok
+        return ok
+    
+    @staticmethod
+    def _log_slack_response(status_code: int, text: str, description: str) -> bool:
+        if status_code == 200:
+            logger.info(f"Slack alert sent successfully for {description}")
+            return True
+        logger.error(f"Slack webhook failed: {status_code} - {text}")
+        return False
+    
+    def _start_async_client(self):
+        """Run an asyncio loop in a daemon thread and create the shared httpx client on it"""
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="alert-slack-loop", daemon=True).start()
+        
+        async def create_client():
+            limits = httpx.Limits(max_keepalive_connections=8)
+            try:
+                return httpx.AsyncClient(http2=True, limits=limits, timeout=10)
+            except ImportError:
+                # HTTP/2 needs the optional h2 package
+                return httpx.AsyncClient(limits=limits, timeout=10)
+        
+        self._async_client = asyncio.run_coroutine_threadsafe(create_client(), self._loop).result()
+    
+    def _stop_async_client(self):
+        """Close the httpx client and stop its event loop"""
+        if self._async_client is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._async_client.aclose(), self._loop).result(timeout=5)
         except Exception as e:
-            logger.error(f"Error sending Slack alert: {e}")
+            logger.warning(f"Error closing async Slack client: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._async_client = None
     
     def _send_email_alert(self, alert: Dict):
         """Send alert via email"""
@@ -326,141 +848,124 @@ class AlertManager:
         subject = f"GCP Cost Alert: {alert['type'].replace('_', ' ').title()}"
         body = self._format_email_message(alert)
         
-        # Create message
-        msg = MIMEMultipart()
+        # Create message (plain text only, so no multipart wrapper)
+        msg = EmailMessage()
         msg['From'] = self.config.email_username
-        msg['To'] = ', '.join(self.config.email_recipients)
+        msg['To'] = self._email_to
         msg['Subject'] = subject
+        msg.set_content(body)
         
-        msg.attach(MIMEText(body, 'plain'))
-        
-        # Send email
-        with smtplib.SMTP(self.config.email_smtp_server, self.config.email_smtp_port) as server:
-            server.starttls()
-            server.login(self.config.email_username, self.config.email_password)
-            server.send_message(msg)
+        # Send email over the cached connection, reconnecting once if the server dropped it
+        try:
+            self._get_smtp().send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            self.close_smtp()
+            self._get_smtp().send_message(msg)
         
         logger.info(f"Email alert sent to {len(self.config.email_recipients)} recipients")
     
-    def _format_cost_spike_slack_message(self, alert: Dict) -> str:
-        """Format cost spike alert for Slack"""
-        emoji = "🚨" if alert['severity'] == 'critical' else "⚠️"
-        
-        return f"""{emoji} *Cost Spike Alert*
-*Service:* {alert['service']}
-*Current Cost:* ₹{alert['current_cost']:.2f}
-*Previous Cost:* ₹{alert['previous_cost']:.2f}
-*Increase:* ₹{alert['increase_amount']:.2f} ({alert['increase_percentage']:.1f}%)
-*Threshold:* ₹{alert['threshold_amount']:.2f} / {alert['threshold_percentage']:.1f}%
-*Time:* {alert['timestamp']}"""
-    
-    def _format_budget_exceeded_slack_message(self, alert: Dict) -> str:
-        """Format budget exceeded alert for Slack"""
-        return f"""🚨 *Budget Exceeded Alert*
-*Service:* {alert['service']}
-*Current Cost:* ₹{alert['current_cost']:.2f}
-*Budget Limit:* ₹{alert['budget_limit']:.2f}
-*Exceeded By:* ₹{alert['exceeded_amount']:.2f}
-*Time:* {alert['timestamp']}"""
-    
-    def _format_anomaly_slack_message(self, alert: Dict) -> str:
-        """Format anomaly alert for Slack"""
-        emoji = "🔍" if alert['severity'] == 'medium' else "🚨"
-        
-        return f"""{emoji} *Anomaly Detected*
-*Service:* {alert['service']}
-*Anomaly Score:* {alert['anomaly_score']:.2f}
-*Cost Impact:* ₹{alert['cost_impact']:.2f}
-*Time:* {alert['timestamp']}"""
-    
-    def _format_generic_slack_message(self, alert: Dict) -> str:
-        """Format generic alert for Slack"""
-        return f"""⚠️ *Alert: {alert['type'].replace('_', ' ').title()}*
-*Service:* {alert['service']}
-*Details:* {json.dumps(alert, indent=2)}
-*Time:* {alert['timestamp']}"""
+    def _get_smtp(self) -> smtplib.SMTP:
+        """Return this thread's logged-in SMTP connection, opening one if needed"""
+        key = (self.config.email_smtp_server, self.config.email_smtp_port, self.config.email_username)
+        conn = getattr(_smtp_local, 'conn', None)
+        if conn is not None and getattr(_smtp_local, 'key', None) == key:
+            try:
+                # Cheap liveness check before reusing the connection
+                if conn.noop()[0] == 250:
+                    return conn
+            except smtplib.SMTPException:
+                pass
+        self.close_smtp()
+        
+        conn = smtplib.SMTP(self.config.email_smtp_server, self.config.email_smtp_port)
+        conn.starttls()
+        conn.login(self.config.email_username, self.config.email_password)
+        _smtp_local.conn = conn
+        _smtp_local.key = key
+        return conn
+    
+    def close_smtp(self):
+        """Close this thread's cached SMTP connection, if any"""
+        conn = getattr(_smtp_local, 'conn', None)
+        _smtp_local.conn = None
+        if conn is not None:
+            try:
+                conn.quit()
+            except (smtplib.SMTPException, OSError):
+                conn.close()
+    
+    def _format_slack_message(self, alert: Dict) -> str:
+        """Format alert for Slack"""
+        return self._render(SLACK_TEMPLATES, alert)
     
     def _format_email_message(self, alert: Dict) -> str:
         """Format alert for email"""
-        if alert['type'] == 'cost_spike':
-            return f"""GCP Cost Spike Alert
-
-Service: {alert['service']}
-Current Cost: ₹{alert['current_cost']:.2f}
-Previous Cost: ₹{alert['previous_cost']:.2f}
-Increase: ₹{alert['increase_amount']:.2f} ({alert['increase_percentage']:.1f}%)
-Threshold: ₹{alert['threshold_amount']:.2f} / {alert['threshold_percentage']:.1f}%
-Time: {alert['timestamp']}
-
-Please review your GCP costs immediately."""
-        
-        elif alert['type'] == 'budget_exceeded':
-            return f"""GCP Budget Exceeded Alert
-
-Service: {alert['service']}
-Current Cost: ₹{alert['current_cost']:.2f}
-Budget Limit: ₹{alert['budget_limit']:.2f}
-Exceeded By: ₹{alert['exceeded_amount']:.2f}
-Time: {alert['timestamp']}
-
-URGENT: Budget limit has been exceeded!"""
-        
-        elif alert['type'] == 'anomaly':
-            return f"""GCP Anomaly Alert
-
-Service: {alert['service']}
-Anomaly Score: {alert['anomaly_score']:.2f}
-Cost Impact: ₹{alert['cost_impact']:.2f}
-Time: {alert['timestamp']}
-
-Anomalous cost pattern detected."""
-        
+        return self._render(EMAIL_TEMPLATES, alert)
+    
+    @staticmethod
+    def _render(templates: Dict[str, str], alert: Dict) -> str:
+        """Fill the template for the alert's type, falling back to the generic one"""
+        alert_type = alert['type']
+        template = templates.get(alert_type)
+        if template is None:
+            return templates['generic'].format_map({
+                **alert,
+                'title': alert_type.replace('_', ' ').title(),
+                'details': json.dumps(alert, indent=2)
+            })
+        
+        if alert_type == 'anomaly':
+            emoji = "🔍" if alert['severity'] == 'medium' else "🚨"
         else:
-            return f"""GCP Alert: {alert['type'].replace('_', ' ').title()}
-
-Service: {alert['service']}
-Details: {json.dumps(alert, indent=2)}
-Time: {alert['timestamp']}"""
+            emoji = "🚨" if alert['severity'] == 'critical' else "⚠️"
+        return template.format_map({**alert, 'emoji': emoji})
     
     def get_alert_history(self, hours: int = 24) -> List[Dict]:
         """Get alert history for the last N hours"""
-        cutoff_time = datetime.now() - timedelta(hours=hours)
-        
-        return [
-            alert for alert in self.alert_history
-            if datetime.fromisoformat(alert['timestamp']) > cutoff_time
-        ]
+        cutoff = time.time() - hours * 3600
+        
+        # History is time-ordered, so walk back from the newest alert and stop at the first stale one
+        recent = []
+        for alert in reversed(self.alert_history):
+            if alert['ts'] <= cutoff:
+                break
+            recent.append(alert)
+        recent.reverse()
+        return recent
     
     def get_alert_stats(self) -> Dict[str, Any]:
         """Get alert statistics"""
-        total_alerts = len(self.alert_history)
-        alerts_24h = len(self.get_alert_history(24))
-        alerts_7d = len(self.get_alert_history(24 * 7))
+        now = time.time()
+        alerts_24h = alerts_7d = 0
+        alert_types = Counter()
         
-        # Count by type
-        alert_types = {}
+        # Single pass over the history for all counts
         for alert in self.alert_history:
-            alert_type = alert['type']
-            alert_types[alert_type] = alert_types.get(alert_type, 0) + 1
+            alert_types[alert['type']] += 1
+            age = now - alert['ts']
+            if age < 86400:
+                alerts_24h += 1
+            if age < 604800:
+                alerts_7d += 1
         
         return {
-            'total_alerts': total_alerts,
+            'total_alerts': len(self.alert_history),
             'alerts_24h': alerts_24h,
             'alerts_7d': alerts_7d,
-            'alert_types': alert_types
+            'alert_types': dict(alert_types)
         }
 
 def main():
     """Main function to run alert manager"""
     # Load configuration
     config_file = "config.json"
-    if not os.path.exists(config_file):
+    try:
+        with open(config_file, 'r') as f:
+            config_data = json.load(f)
+    except FileNotFoundError:
         logger.error(f"Config file {config_file} not found")
         return
     
-    with open(config_file, 'r') as f:
-        config_data = json.load(f)
-    
     config = AlertConfig(**config_data)
     
     # Initialize alert manager
@@ -469,12 +974,14 @@ def main():
     logger.info("Alert Manager started")
     logger.info("Monitoring for cost spikes, budget exceedances, and anomalies...")
     
-    # Keep running
-    try:
-        while True:
-            time.sleep(60)  # Check every minute
-    except KeyboardInterrupt:
-        logger.info("Alert Manager stopped")
+    # Keep running (without waking up) until SIGINT/SIGTERM
+    stop = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    stop.wait()
+    
+    alert_manager.shutdown()
+    logger.info("Alert Manager stopped")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+JSON Utilities
+Shared JSON read/write helpers, backed by orjson when installed
+"""
+
+import json
+from pathlib import Path
+from typing import Any
+
+# Use orjson for faster JSON parsing and serialization when installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ORJSON_AVAILABLE = orjson is not None
+
+# Parse JSON from str or bytes
+loads = orjson.loads if orjson else json.loads
+
+def dumps(data: Any) -> bytes:
+    """Serialize to compact JSON bytes (numpy scalars and arrays included)"""
+    if orjson:
+        return orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(data, separators=(',', ':'), default=lambda o: o.tolist()).encode()
+
+def read_json(path: str) -> Any:
+    """Read and parse a JSON file"""
+    return loads(Path(path).read_bytes())
+
+def write_json(path: str, data: Any, indent: bool = False):
+    """Write data (which may contain numpy arrays) as compact JSON, or indented for files people read"""
+    if not indent:
+        Path(path).write_bytes(dumps(data))
+    elif orjson:
+        Path(path).write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+    else:
+        Path(path).write_text(json.dumps(data, indent=2, default=lambda o: o.tolist()))
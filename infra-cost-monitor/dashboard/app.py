@@ -6,16 +6,36 @@ Real-time web dashboard for cost monitoring and alert management
 """
 
 import os
-import json
+import sys
+import gzip
+import heapq
+import importlib.util
 import logging
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
 from datetime import datetime, timedelta
 from typing import Dict, List, Any
-from flask import Flask, render_template, jsonify, request, redirect, url_for
+import numpy as np
+import pandas as pd
+from flask import Flask, Response, render_template, jsonify, request, redirect, url_for
+from flask.json.provider import JSONProvider
 from flask_socketio import SocketIO, emit
 import threading
 import time
 from dotenv import load_dotenv
 
+# Shared JSON helpers (orjson when installed)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from json_utils import ORJSON_AVAILABLE, dumps as _dumps, loads, read_json
+
+# ijson parses very large exports incrementally instead of reading them whole
+try:
+    import ijson
+    IJSON_AVAILABLE = True
+except ImportError:
+    IJSON_AVAILABLE = False
+
 # Load environment variables
 load_dotenv()
 
@@ -23,652 +43,693 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Brotli compresses JSON noticeably better than gzip for browsers that accept it
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+# watchdog delivers filesystem events so the dashboard refreshes only when files change
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+    WATCHDOG_AVAILABLE = True
+except ImportError:
+    WATCHDOG_AVAILABLE = False
+
+# numba compiles the per-group reduction loop when installed
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# DuckDB runs the grouped cost reductions in its vectorized engine when installed
+try:
+    import duckdb
+    DUCKDB_AVAILABLE = True
+except ImportError:
+    DUCKDB_AVAILABLE = False
+
+COST_FILE = "../output/composite_data.json"
+ANOMALY_FILE = "../output/anomalies.json"
+ALERT_FILE = "../data/alert_history.jsonl"
+
+# msgpack lets Socket.IO send compact binary frames instead of JSON text; python-socketio
+# imports it itself when serializer='msgpack', so only check that it is installed
+MSGPACK_AVAILABLE = importlib.util.find_spec('msgpack') is not None
+
+# Opt-in, since the page must load the matching msgpack build of the Socket.IO client
+SOCKETIO_MSGPACK = MSGPACK_AVAILABLE and os.environ.get('DASHBOARD_SOCKETIO_MSGPACK', '').lower() in ('1', 'true')
+
+# Files above this size are stream-parsed with ijson when it is available
+LARGE_JSON_BYTES = 100 * 1024 * 1024
+
+def _read_json(path: str) -> Any:
+    """Read a JSON document, streaming top-level array items for very large files"""
+    if IJSON_AVAILABLE and os.path.getsize(path) > LARGE_JSON_BYTES:
+        with open(path, 'rb') as f:
+            return list(ijson.items(f, 'item', use_float=True))
+    return read_json(path)
+
+# Payloads smaller than this aren't worth compressing
+MIN_COMPRESS_BYTES = 1024
+
+def _compress_variants(body: bytes) -> Dict[str, bytes]:
+    """Return the body keyed by Content-Encoding, with compressed variants for larger payloads"""
+    variants = {'identity': body}
+    if len(body) >= MIN_COMPRESS_BYTES:
+        if BROTLI_AVAILABLE:
+            variants['br'] = brotli.compress(body, quality=5)
+        variants['gzip'] = gzip.compress(body, compresslevel=6)
+    return variants
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def group_sum(values, ids, n):
+        """Per-group sums of values keyed by integer ids in [0, n)"""
+        out = np.zeros(n, dtype=values.dtype)
+        for i in range(values.size):
+            out[ids[i]] += values[i]
+        return out
+else:
+    def group_sum(values, ids, n):
+        """Per-group sums of values keyed by integer ids in [0, n)"""
+        return np.bincount(ids, weights=values, minlength=n)
+
+def _read_jsonl(path: str) -> List[Dict[str, Any]]:
+    """Read one JSON record per line, skipping blank lines"""
+    with open(path, 'rb') as f:
+        return [loads(line) for line in f if line.strip()]
+
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-here')
-socketio = SocketIO(app, cors_allowed_origins="*")
+socketio = SocketIO(app, cors_allowed_origins="*",
+                    serializer='msgpack' if SOCKETIO_MSGPACK else 'default')
+
+if ORJSON_AVAILABLE:
+    class OrjsonProvider(JSONProvider):
+        """Flask JSON provider backed by orjson"""
+        
+        def dumps(self, obj: Any, **kwargs: Any) -> str:
+            return _dumps(obj).decode()
+        
+        def loads(self, s, **kwargs: Any) -> Any:
+            return loads(s)
+    
+    app.json = OrjsonProvider(app)
+
+@dataclass(frozen=True)
+class Snapshot:
+    """Immutable view of the loaded data and everything derived from it.
+    
+    A refresh builds a new Snapshot and publishes it with a single reference
+    assignment, so readers always see data, summaries and encoded payloads
+    from the same load without taking a lock.
+    """
+    cost_data: List[Dict[str, Any]]
+    anomaly_data: List[Dict[str, Any]]
+    alert_data: List[Dict[str, Any]]  # sorted by timestamp
+    cost_soa: Dict[str, np.ndarray]
+    service_totals: np.ndarray
+    alert_ts: np.ndarray
+    alert_ts_valid: int
+    recent_alerts: List[Dict[str, Any]]  # newest first
+    recent_alert_ts: np.ndarray
+    summaries: Dict[str, Any]
+    encoded: Dict[str, Dict[str, bytes]]  # endpoint -> pre-serialized JSON by Content-Encoding
+    last_update: datetime
+    last_update_iso: str
+    version: int
+    
+    @property
+    def etag(self) -> str:
+        """ETag for this data version"""
+        return f"v{self.version}"
 
 class DashboardData:
     """Manages dashboard data and real-time updates"""
     
+    # Writers often touch a file several times in a row; coalesce those events
+    _REFRESH_DEBOUNCE_SECONDS = 0.1
+    
+    # Sizes of the precomputed recent alert and anomaly lists
+    _RECENT_ALERTS = 10
+    _RECENT_ANOMALIES = 20
+    
+    # Minimum spacing between broadcasts, widened by one step per this many clients
+    _BROADCAST_WINDOW_SECONDS = 0.1
+    _CLIENTS_PER_WINDOW_STEP = 50
+    
     def __init__(self):
-        self.cost_data = []
-        self.anomaly_data = []
-        self.alert_data = []
-        self.last_update = datetime.now()
         self.update_interval = 30  # seconds
+        self._file_meta = {}  # path -> (mtime_ns, size) at last successful load
+        
+        # Only the loader replaces this; readers take the reference once and use it
+        alert_data, alert_ts, alert_ts_valid = self._index_alert_timestamps([])
+        self._snap = self._build_snapshot(
+            cost_data=[], anomaly_data=[], alert_data=alert_data,
+            cost_soa=self._build_cost_soa([]), alert_ts=alert_ts, alert_ts_valid=alert_ts_valid,
+            changed=('cost', 'anomalies', 'alerts'), previous=None
+        )
         
-        # Start background update thread
         self.running = True
-        self.update_thread = threading.Thread(target=self._background_update)
-        self.update_thread.daemon = True
-        self.update_thread.start()
+        self.client_count = 0
+        self._client_lock = threading.Lock()
+        self._dirty = threading.Event()
+        self._last_broadcast_ns = 0
+        self.broadcast_task = socketio.start_background_task(self._broadcast_loop)
+        
+        self._observer = None
+        self._refresh_timer = None
+        self._refresh_timer_lock = threading.Lock()
+        
+        if WATCHDOG_AVAILABLE:
+            self._start_file_watcher()
+        else:
+            # Fall back to polling when watchdog isn't installed
+            self.update_task = socketio.start_background_task(self._background_update)
+    
+    @property
+    def cost_data(self) -> List[Dict[str, Any]]:
+        """Raw cost records from the current snapshot"""
+        return self._snap.cost_data
+    
+    @property
+    def anomaly_data(self) -> List[Dict[str, Any]]:
+        """Raw anomaly records from the current snapshot"""
+        return self._snap.anomaly_data
+    
+    @property
+    def alert_data(self) -> List[Dict[str, Any]]:
+        """Alert records from the current snapshot, oldest first"""
+        return self._snap.alert_data
+    
+    @property
+    def last_update(self) -> datetime:
+        """When the current snapshot was built"""
+        return self._snap.last_update
+    
+    @property
+    def last_update_iso(self) -> str:
+        """ISO form of last_update, formatted once per refresh"""
+        return self._snap.last_update_iso
+    
+    @property
+    def etag(self) -> str:
+        """ETag for the currently published data version"""
+        return self._snap.etag
+    
+    def _start_file_watcher(self):
+        """Refresh on filesystem events for the data files instead of polling"""
+        watched = {os.path.abspath(path) for path in (COST_FILE, ANOMALY_FILE, ALERT_FILE)}
+        handler = _DataFileHandler(watched, self._schedule_refresh)
+        
+        self._observer = Observer()
+        self._observer.daemon = True
+        for directory in {os.path.dirname(path) for path in watched}:
+            os.makedirs(directory, exist_ok=True)
+            self._observer.schedule(handler, directory, recursive=False)
+        self._observer.start()
+        
+        # Initial load
+        self._schedule_refresh()
+    
+    def _schedule_refresh(self):
+        """Debounce bursts of file events into a single refresh"""
+        with self._refresh_timer_lock:
+            if self._refresh_timer is not None:
+                self._refresh_timer.cancel()
+            self._refresh_timer = threading.Timer(self._REFRESH_DEBOUNCE_SECONDS, self._refresh)
+            self._refresh_timer.daemon = True
+            self._refresh_timer.start()
+    
+    def _refresh(self):
+        """Reload changed files and mark them for the next broadcast"""
+        try:
+            if self._load_latest_data():
+                self._dirty.set()
+        except Exception as e:
+            logger.error(f"Error in background update: {e}")
+    
+    def _broadcast_loop(self):
+        """Emit at most one broadcast per window, however many refreshes land in it"""
+        while self.running:
+            if not self._dirty.wait(timeout=1.0):
+                continue
+            
+            # Quiet periods flush immediately; bursts wait out the window and coalesce
+            window = self._BROADCAST_WINDOW_SECONDS * (1 + self.client_count // self._CLIENTS_PER_WINDOW_STEP)
+            elapsed = (time.monotonic_ns() - self._last_broadcast_ns) / 1e9
+            if elapsed < window:
+                socketio.sleep(window - elapsed)
+            
+            self._dirty.clear()
+            self._broadcast_updates()
+            self._last_broadcast_ns = time.monotonic_ns()
+    
+    def client_connected(self):
+        """Track a newly connected Socket.IO client"""
+        with self._client_lock:
+            self.client_count += 1
+    
+    def client_disconnected(self):
+        """Track a Socket.IO client going away"""
+        with self._client_lock:
+            self.client_count = max(0, self.client_count - 1)
     
     def _background_update(self):
         """Background thread to update data periodically"""
         while self.running:
             try:
-                self._load_latest_data()
-                self._broadcast_updates()
-                time.sleep(self.update_interval)
+                # Nothing to push when none of the files changed
+                if self._load_latest_data():
+                    self._dirty.set()
+                socketio.sleep(self.update_interval)
             except Exception as e:
                 logger.error(f"Error in background update: {e}")
-                time.sleep(60)  # Wait longer on error
+                socketio.sleep(60)  # Wait longer on error
     
-    def _load_latest_data(self):
-        """Load latest data from JSON files"""
+    def _load_latest_data(self) -> bool:
+        """Load latest data from JSON files, returning True if anything changed"""
+        snap = self._snap
+        cost_data, cost_soa = snap.cost_data, snap.cost_soa
+        anomaly_data = snap.anomaly_data
+        alert_data, alert_ts, alert_ts_valid = snap.alert_data, snap.alert_ts, snap.alert_ts_valid
+        changed = set()
         try:
             # Load cost data
-            cost_file = "../output/composite_data.json"
-            if os.path.exists(cost_file):
-                with open(cost_file, 'r') as f:
-                    self.cost_data = json.load(f)
+            cost_file = COST_FILE
+            meta = self._changed_file_meta(cost_file)
+            if meta:
+                cost_data = _read_json(cost_file)
+                # Aggregations read the typed columns; the raw list is only served as-is
+                cost_soa = self._build_cost_soa(cost_data)
+                self._file_meta[cost_file] = meta
+                changed.add('cost')
             
             # Load anomaly data
-            anomaly_file = "../output/anomalies.json"
-            if os.path.exists(anomaly_file):
-                with open(anomaly_file, 'r') as f:
-                    self.anomaly_data = json.load(f)
+            anomaly_file = ANOMALY_FILE
+            meta = self._changed_file_meta(anomaly_file)
+            if meta:
+                anomaly_data = _read_json(anomaly_file)
+                self._file_meta[anomaly_file] = meta
+                changed.add('anomalies')
             
-            # Load alert data
-            alert_file = "../alert_system/alert_history.json"
-            if os.path.exists(alert_file):
-                with open(alert_file, 'r') as f:
-                    self.alert_data = json.load(f)
-            
-            self.last_update = datetime.now()
+            # Load alert data (the alert manager appends one JSON record per line)
+            alert_file = ALERT_FILE
+            meta = self._changed_file_meta(alert_file)
+            if meta:
+                alert_data, alert_ts, alert_ts_valid = self._index_alert_timestamps(_read_jsonl(alert_file))
+                self._file_meta[alert_file] = meta
+                changed.add('alerts')
             
         except Exception as e:
             logger.error(f"Error loading data: {e}")
+        
+        if changed:
+            # Publish everything from this load in one reference swap
+            self._snap = self._build_snapshot(
+                cost_data=cost_data, anomaly_data=anomaly_data, alert_data=alert_data,
+                cost_soa=cost_soa, alert_ts=alert_ts, alert_ts_valid=alert_ts_valid,
+                changed=changed, previous=snap
+            )
+        return bool(changed)
+    
+    def _changed_file_meta(self, path: str):
+        """Return (mtime_ns, size) if the file exists and differs from the last load, else None"""
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        
+        meta = (st.st_mtime_ns, st.st_size)
+        return None if self._file_meta.get(path) == meta else meta
+    
+    @staticmethod
+    def _build_cost_soa(records: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+        """Convert cost records into parallel typed columns for the aggregations"""
+        # Composite records carry the service name in 'service_desc'
+        services = [r.get('service') or r.get('service_desc') or 'Unknown' for r in records]
+        service_index = {}
+        service_id = np.fromiter((service_index.setdefault(name, len(service_index)) for name in services),
+                                 dtype=np.int32, count=len(services))
+        
+        dates = pd.to_datetime([r.get('date') for r in records], format='ISO8601', errors='coerce')
+        
+        # Costs are held as integer paise so sums are exact; convert back to rupees once at the end
+        return {
+            'cost_paise': np.fromiter((round(float(r.get('cost') or 0) * 100) for r in records),
+                                      dtype=np.int64, count=len(records)),
+            'service_id': service_id,
+            'service_names': np.array(list(service_index), dtype=object),
+            'date': dates.to_numpy().astype('datetime64[D]')
+        }
+    
+    @staticmethod
+    def _index_alert_timestamps(alerts: List[Dict[str, Any]]):
+        """Sort alerts by time and return them with their parsed timestamps and the count of valid ones"""
+        ts = pd.to_datetime([a.get('timestamp') for a in alerts],
+                            format='ISO8601', errors='coerce').to_numpy(dtype='datetime64[ns]')
+        # argsort places unparseable (NaT) timestamps last
+        order = np.argsort(ts, kind='stable')
+        return [alerts[i] for i in order], ts[order], int(np.count_nonzero(~np.isnat(ts)))
+    
+    def _build_snapshot(self, cost_data, anomaly_data, alert_data, cost_soa, alert_ts,
+                        alert_ts_valid, changed, previous) -> Snapshot:
+        """Compute summaries and encoded payloads for the changed sources and wrap them up"""
+        summaries = dict(previous.summaries) if previous else {}
+        service_totals = previous.service_totals if previous else None
+        if 'cost' in changed:
+            if DUCKDB_AVAILABLE and len(cost_data):
+                service_totals, cost_trends = self._duckdb_aggregates(cost_soa)
+            else:
+                service_totals = group_sum(cost_soa['cost_paise'], cost_soa['service_id'],
+                                           len(cost_soa['service_names'])) / 100
+                cost_trends = self._compute_cost_trends(cost_soa)
+            summaries['cost_summary'] = self._compute_cost_summary(cost_data, cost_soa, service_totals)
+            summaries['cost_trends'] = cost_trends
+            summaries['service_breakdown'] = self._compute_service_breakdown(cost_soa, service_totals)
+        if 'anomalies' in changed:
+            summaries['anomaly_summary'] = self._compute_anomaly_summary(anomaly_data)
+            summaries['recent_anomalies'] = heapq.nlargest(
+                self._RECENT_ANOMALIES, anomaly_data, key=lambda a: a.get('timestamp', ''))
+        if 'alerts' in changed:
+            summaries['alert_summary'] = self._compute_alert_summary(alert_data)
+        
+        # Alerts are sorted oldest first, so the newest valid ones are just before the NaT tail
+        recent_start = max(0, alert_ts_valid - self._RECENT_ALERTS)
+        recent_alerts = alert_data[recent_start:alert_ts_valid][::-1]
+        recent_alert_ts = alert_ts[recent_start:alert_ts_valid][::-1]
+        
+        last_update = datetime.now()
+        last_update_iso = last_update.isoformat()
+        
+        # Encode the API payloads once here so requests never serialize
+        encoded = {
+            'data': _dumps({
+                'cost_data': cost_data,
+                'anomaly_data': anomaly_data,
+                'alert_data': alert_data,
+                'last_update': last_update_iso
+            }),
+            'summary': _dumps({
+                'cost_summary': summaries['cost_summary'],
+                'anomaly_summary': summaries['anomaly_summary'],
+                'alert_summary': summaries['alert_summary']
+            }),
+            'cost_trends': _dumps(summaries['cost_trends']),
+            'service_breakdown': _dumps(summaries['service_breakdown']),
+            'anomalies': _dumps(summaries['recent_anomalies'])
+        }
+        # ...and compress them once per refresh rather than per response
+        encoded = {key: _compress_variants(body) for key, body in encoded.items()}
+        
+        return Snapshot(
+            cost_data=cost_data,
+            anomaly_data=anomaly_data,
+            alert_data=alert_data,
+            cost_soa=cost_soa,
+            service_totals=service_totals,
+            alert_ts=alert_ts,
+            alert_ts_valid=alert_ts_valid,
+            recent_alerts=recent_alerts,
+            recent_alert_ts=recent_alert_ts,
+            summaries=summaries,
+            encoded=encoded,
+            last_update=last_update,
+            last_update_iso=last_update_iso,
+            version=previous.version + 1 if previous else 1
+        )
     
     def _broadcast_updates(self):
-        """Broadcast updates to connected clients"""
+        """Broadcast the refreshed summaries to connected clients"""
         try:
-            socketio.emit('data_update', {
-                'cost_data': self.cost_data,
-                'anomaly_data': self.anomaly_data,
-                'alert_data': self.alert_data,
-                'last_update': self.last_update.isoformat()
-            })
+            socketio.emit('data_update', self.get_snapshot())
         except Exception as e:
             logger.error(f"Error broadcasting updates: {e}")
     
+    def get_snapshot(self) -> Dict[str, Any]:
+        """Get the summaries the page renders; records are served by the REST endpoints"""
+        snap = self._snap
+        return {
+            'last_update': snap.last_update_iso,
+            'cost_summary': snap.summaries['cost_summary'],
+            'anomaly_summary': snap.summaries['anomaly_summary'],
+            'alert_summary': snap.summaries['alert_summary']
+        }
+    
     def get_dashboard_data(self) -> Dict[str, Any]:
         """Get current dashboard data"""
+        snap = self._snap
         return {
-            'cost_data': self.cost_data,
-            'anomaly_data': self.anomaly_data,
-            'alert_data': self.alert_data,
-            'last_update': self.last_update.isoformat()
+            'cost_data': snap.cost_data,
+            'anomaly_data': snap.anomaly_data,
+            'alert_data': snap.alert_data,
+            'last_update': snap.last_update_iso
         }
     
+    def get_encoded(self, key: str):
+        """Get the pre-serialized JSON variants (by Content-Encoding) for an endpoint and the ETag"""
+        snap = self._snap
+        return snap.encoded[key], snap.etag
+    
     def get_cost_summary(self) -> Dict[str, Any]:
         """Get cost summary statistics"""
-        if not self.cost_data:
+        return self._snap.summaries['cost_summary']
+    
+    def get_anomaly_summary(self) -> Dict[str, Any]:
+        """Get anomaly summary statistics"""
+        return self._snap.summaries['anomaly_summary']
+    
+    def get_alert_summary(self) -> Dict[str, Any]:
+        """Get alert summary statistics"""
+        return self._snap.summaries['alert_summary']
+    
+    def get_cost_trends(self) -> List[Dict[str, Any]]:
+        """Get daily cost totals sorted by date"""
+        return self._snap.summaries['cost_trends']
+    
+    def get_service_breakdown(self) -> List[Dict[str, Any]]:
+        """Get per-service cost totals, most expensive first"""
+        return self._snap.summaries['service_breakdown']
+    
+    def get_recent_alerts(self, hours: int = 24) -> List[Dict[str, Any]]:
+        """Get the newest alerts raised within the last `hours`, newest first"""
+        snap = self._snap
+        cutoff = np.datetime64(datetime.now() - timedelta(hours=hours), 'ns')
+        # recent_alert_ts is descending, so the alerts inside the window form a prefix
+        count = int(np.count_nonzero(snap.recent_alert_ts > cutoff))
+        return snap.recent_alerts[:count]
+    
+    @staticmethod
+    def _compute_cost_summary(cost_data, cost_soa, service_totals) -> Dict[str, Any]:
+        """Compute cost summary statistics"""
+        if not cost_data:
             return {}
         
-        total_cost = sum(item.get('cost', 0) for item in self.cost_data)
-        services = {}
-        
-        for item in self.cost_data:
-            service = item.get('service', 'Unknown')
-            cost = item.get('cost', 0)
-            services[service] = services.get(service, 0) + cost
+        total_cost = int(cost_soa['cost_paise'].sum()) / 100
+        services = dict(zip(cost_soa['service_names'].tolist(), service_totals.tolist()))
         
         return {
             'total_cost': total_cost,
             'services': services,
-            'data_points': len(self.cost_data)
+            'data_points': len(cost_data)
         }
     
-    def get_anomaly_summary(self) -> Dict[str, Any]:
-        """Get anomaly summary statistics"""
-        if not self.anomaly_data:
+    @staticmethod
+    def _compute_cost_trends(cost_soa) -> List[Dict[str, Any]]:
+        """Compute daily cost totals sorted by date"""
+        dates = cost_soa['date']
+        valid = ~np.isnat(dates)
+        if not valid.any():
+            return []
+        
+        # Sort once, then sum each run of equal dates in a single reduceat pass
+        dates = dates[valid]
+        order = np.argsort(dates, kind='stable')
+        dates = dates[order]
+        costs = cost_soa['cost_paise'][valid][order]
+        boundaries = np.concatenate(([0], np.flatnonzero(dates[1:] != dates[:-1]) + 1))
+        totals = np.add.reduceat(costs, boundaries) / 100
+        
+        return [{'date': date, 'cost': cost}
+                for date, cost in zip(np.datetime_as_string(dates[boundaries]).tolist(), totals.tolist())]
+    
+    @staticmethod
+    def _duckdb_aggregates(cost_soa):
+        """Per-service totals (indexed by service id) and daily trends via DuckDB group-bys"""
+        con = duckdb.connect()
+        try:
+            con.register('cost', pd.DataFrame({
+                'service_id': cost_soa['service_id'],
+                'cost_paise': cost_soa['cost_paise'],
+                'date': cost_soa['date']
+            }))
+            
+            service_totals = np.zeros(len(cost_soa['service_names']))
+            rows = con.execute(
+                "SELECT service_id, sum(cost_paise) FROM cost GROUP BY service_id"
+            ).fetchall()
+            for service_id, paise in rows:
+                service_totals[service_id] = int(paise) / 100
+            
+            cost_trends = [
+                {'date': day.isoformat(), 'cost': int(paise) / 100}
+                for day, paise in con.execute(
+                    "SELECT CAST(date AS DATE), sum(cost_paise) FROM cost "
+                    "WHERE date IS NOT NULL GROUP BY 1 ORDER BY 1"
+                ).fetchall()
+            ]
+        finally:
+            con.close()
+        
+        return service_totals, cost_trends
+    
+    @staticmethod
+    def _compute_service_breakdown(cost_soa, service_totals) -> List[Dict[str, Any]]:
+        """Compute per-service cost totals, most expensive first"""
+        if not len(service_totals):
+            return []
+        
+        order = np.argsort(-service_totals, kind='stable')
+        return [{'service': service, 'cost': cost}
+                for service, cost in zip(cost_soa['service_names'][order].tolist(),
+                                         service_totals[order].tolist())]
+    
+    @staticmethod
+    def _compute_anomaly_summary(anomaly_data) -> Dict[str, Any]:
+        """Compute anomaly summary statistics"""
+        if not anomaly_data:
             return {}
         
-        total_anomalies = len(self.anomaly_data)
-        high_severity = len([a for a in self.anomaly_data if a.get('severity') == 'high'])
-        medium_severity = len([a for a in self.anomaly_data if a.get('severity') == 'medium'])
+        severities = Counter(a.get('severity') for a in anomaly_data)
         
         return {
-            'total_anomalies': total_anomalies,
-            'high_severity': high_severity,
-            'medium_severity': medium_severity
+            'total_anomalies': sum(severities.values()),
+            'high_severity': severities['high'],
+            'medium_severity': severities['medium']
         }
     
-    def get_alert_summary(self) -> Dict[str, Any]:
-        """Get alert summary statistics"""
-        if not self.alert_data:
+    @staticmethod
+    def _compute_alert_summary(alert_data) -> Dict[str, Any]:
+        """Compute alert summary statistics"""
+        if not alert_data:
             return {}
         
-        total_alerts = len(self.alert_data)
-        critical_alerts = len([a for a in self.alert_data if a.get('severity') == 'critical'])
-        high_alerts = len([a for a in self.alert_data if a.get('severity') == 'high'])
+        severities = Counter(a.get('severity') for a in alert_data)
         
         return {
-            'total_alerts': total_alerts,
-            'critical_alerts': critical_alerts,
-            'high_alerts': high_alerts
+            'total_alerts': sum(severities.values()),
+            'critical_alerts': severities['critical'],
+            'high_alerts': severities['high']
         }
 
+if WATCHDOG_AVAILABLE:
+    class _DataFileHandler(FileSystemEventHandler):
+        """Calls on_change when one of the watched data files is written or replaced"""
+        
+        def __init__(self, paths, on_change):
+            super().__init__()
+            self.paths = paths
+            self.on_change = on_change
+        
+        def on_any_event(self, event):
+            if event.is_directory:
+                return
+            # Atomic replaces arrive as a move onto the watched path
+            targets = (event.src_path, getattr(event, 'dest_path', ''))
+            if any(os.path.abspath(path) in self.paths for path in targets if path):
+                self.on_change()
+
 # Initialize dashboard data
 dashboard_data = DashboardData()
 
+def _cached_json(key: str):
+    """Serve a pre-serialized (and pre-compressed) payload tagged with the data version"""
+    variants, etag = dashboard_data.get_encoded(key)
+    encoding = request.accept_encodings.best_match([e for e in ('br', 'gzip') if e in variants])
+    
+    if encoding:
+        response = Response(variants[encoding], mimetype='application/json')
+        response.headers['Content-Encoding'] = encoding
+        etag = f"{etag}-{encoding}"
+    else:
+        response = Response(variants['identity'], mimetype='application/json')
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
 @app.route('/')
 def index():
     """Main dashboard page"""
-    return render_template('dashboard.html')
+    return render_template('dashboard.html', socketio_msgpack=SOCKETIO_MSGPACK)
 
 @app.route('/api/data')
 def get_data():
     """API endpoint to get dashboard data"""
-    return jsonify(dashboard_data.get_dashboard_data())
+    return _cached_json('data')
 
 @app.route('/api/summary')
 def get_summary():
     """API endpoint to get summary statistics"""
-    return jsonify({
-        'cost_summary': dashboard_data.get_cost_summary(),
-        'anomaly_summary': dashboard_data.get_anomaly_summary(),
-        'alert_summary': dashboard_data.get_alert_summary()
-    })
+    return _cached_json('summary')
 
 @app.route('/api/cost-trends')
 def get_cost_trends():
     """API endpoint to get cost trends"""
-    if not dashboard_data.cost_data:
-        return jsonify([])
-    
-    # Group by date and calculate daily totals
-    daily_costs = {}
-    for item in dashboard_data.cost_data:
-        date = item.get('date', '')
-        cost = item.get('cost', 0)
-        daily_costs[date] = daily_costs.get(date, 0) + cost
-    
-    # Convert to sorted list
-    trends = [{'date': date, 'cost': cost} for date, cost in daily_costs.items()]
-    trends.sort(key=lambda x: x['date'])
-    
-    return jsonify(trends)
+    return _cached_json('cost_trends')
 
 @app.route('/api/service-breakdown')
 def get_service_breakdown():
     """API endpoint to get service cost breakdown"""
-    if not dashboard_data.cost_data:
-        return jsonify([])
-    
-    service_costs = {}
-    for item in dashboard_data.cost_data:
-        service = item.get('service', 'Unknown')
-        cost = item.get('cost', 0)
-        service_costs[service] = service_costs.get(service, 0) + cost
-    
-    breakdown = [{'service': service, 'cost': cost} for service, cost in service_costs.items()]
-    breakdown.sort(key=lambda x: x['cost'], reverse=True)
-    
-    return jsonify(breakdown)
+    return _cached_json('service_breakdown')
 
 @app.route('/api/recent-alerts')
 def get_recent_alerts():
     """API endpoint to get recent alerts"""
-    if not dashboard_data.alert_data:
-        return jsonify([])
-    
-    # Get alerts from last 24 hours
-    cutoff_time = datetime.now() - timedelta(hours=24)
-    recent_alerts = []
-    
-    for alert in dashboard_data.alert_data:
-        alert_time = datetime.fromisoformat(alert.get('timestamp', ''))
-        if alert_time > cutoff_time:
-            recent_alerts.append(alert)
-    
-    # Sort by timestamp (newest first)
-    recent_alerts.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
-    
-    return jsonify(recent_alerts[:10])  # Return last 10 alerts
+    return jsonify(dashboard_data.get_recent_alerts())
 
 @app.route('/api/anomalies')
 def get_anomalies():
     """API endpoint to get recent anomalies"""
-    if not dashboard_data.anomaly_data:
-        return jsonify([])
-    
-    # Sort by timestamp (newest first)
-    anomalies = sorted(dashboard_data.anomaly_data, 
-                      key=lambda x: x.get('timestamp', ''), reverse=True)
-    
-    return jsonify(anomalies[:20])  # Return last 20 anomalies
+    return _cached_json('anomalies')
 
 @socketio.on('connect')
 def handle_connect():
     """Handle client connection"""
     logger.info("Client connected to dashboard")
+    dashboard_data.client_connected()
     emit('connected', {'status': 'connected'})
+    emit('data_update', dashboard_data.get_snapshot())
 
 @socketio.on('disconnect')
 def handle_disconnect():
     """Handle client disconnection"""
     logger.info("Client disconnected from dashboard")
+    dashboard_data.client_disconnected()
 
 @socketio.on('request_data')
 def handle_data_request():
     """Handle data request from client"""
-    emit('data_update', dashboard_data.get_dashboard_data())
+    emit('data_update', dashboard_data.get_snapshot())
+
+@lru_cache(maxsize=1)
+def _iso_second(epoch_second: int) -> str:
+    """ISO timestamp for a whole second, formatted once per second"""
+    return datetime.fromtimestamp(epoch_second).isoformat()
 
 @app.route('/health')
 def health_check():
     """Health check endpoint"""
     return jsonify({
         'status': 'healthy',
-        'timestamp': datetime.now().isoformat(),
-        'data_last_update': dashboard_data.last_update.isoformat()
+        'timestamp': _iso_second(int(time.time())),
+        'data_last_update': dashboard_data.last_update_iso
     })
 
-def create_dashboard_templates():
-    """Create dashboard HTML template"""
-    template_dir = os.path.join(os.path.dirname(__file__), 'templates')
-    os.makedirs(template_dir, exist_ok=True)
-    
-    dashboard_html = '''<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>GCP Cost Monitor Dashboard</title>
-    <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
-    <script src="https://cdn.socket.io/4.0.1/socket.io.min.js"></script>
-    <style>
-        body {
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            margin: 0;
-            padding: 20px;
-            background-color: #f5f5f5;
-        }
-        .header {
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            color: white;
-            padding: 20px;
-            border-radius: 10px;
-            margin-bottom: 20px;
-            box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-        }
-        .header h1 {
-            margin: 0;
-            font-size: 2.5em;
-        }
-        .header p {
-            margin: 10px 0 0 0;
-            opacity: 0.9;
-        }
-        .dashboard-grid {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(300px, 1fr));
-            gap: 20px;
-            margin-bottom: 20px;
-        }
-        .card {
-            background: white;
-            border-radius: 10px;
-            padding: 20px;
-            box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-            transition: transform 0.2s;
-        }
-        .card:hover {
-            transform: translateY(-2px);
-        }
-        .card h3 {
-            margin-top: 0;
-            color: #333;
-            border-bottom: 2px solid #667eea;
-            padding-bottom: 10px;
-        }
-        .metric {
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            margin: 10px 0;
-            padding: 10px;
-            background: #f8f9fa;
-            border-radius: 5px;
-        }
-        .metric-value {
-            font-size: 1.5em;
-            font-weight: bold;
-            color: #667eea;
-        }
-        .chart-container {
-            background: white;
-            border-radius: 10px;
-            padding: 20px;
-            box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-            margin-bottom: 20px;
-        }
-        .alert-item {
-            background: #fff3cd;
-            border: 1px solid #ffeaa7;
-            border-radius: 5px;
-            padding: 10px;
-            margin: 5px 0;
-        }
-        .alert-critical {
-            background: #f8d7da;
-            border-color: #f5c6cb;
-        }
-        .alert-high {
-            background: #fff3cd;
-            border-color: #ffeaa7;
-        }
-        .status-indicator {
-            display: inline-block;
-            width: 10px;
-            height: 10px;
-            border-radius: 50%;
-            margin-right: 10px;
-        }
-        .status-online {
-            background-color: #28a745;
-        }
-        .status-offline {
-            background-color: #dc3545;
-        }
-        .refresh-button {
-            background: #667eea;
-            color: white;
-            border: none;
-            padding: 10px 20px;
-            border-radius: 5px;
-            cursor: pointer;
-            margin: 10px 0;
-        }
-        .refresh-button:hover {
-            background: #5a6fd8;
-        }
-    </style>
-</head>
-<body>
-    <div class="header">
-        <h1>🚀 GCP Cost Monitor Dashboard</h1>
-        <p>Real-time cost monitoring and alert management</p>
-        <div>
-            <span class="status-indicator status-online" id="status-indicator"></span>
-            <span id="status-text">Connected</span>
-            <span id="last-update"></span>
-        </div>
-    </div>
-
-    <div class="dashboard-grid">
-        <div class="card">
-            <h3>💰 Cost Summary</h3>
-            <div class="metric">
-                <span>Total Cost:</span>
-                <span class="metric-value" id="total-cost">₹0.00</span>
-            </div>
-            <div class="metric">
-                <span>Data Points:</span>
-                <span class="metric-value" id="data-points">0</span>
-            </div>
-        </div>
-
-        <div class="card">
-            <h3>🚨 Anomalies</h3>
-            <div class="metric">
-                <span>Total Anomalies:</span>
-                <span class="metric-value" id="total-anomalies">0</span>
-            </div>
-            <div class="metric">
-                <span>High Severity:</span>
-                <span class="metric-value" id="high-anomalies">0</span>
-            </div>
-        </div>
-
-        <div class="card">
-            <h3>⚠️ Alerts</h3>
-            <div class="metric">
-                <span>Total Alerts:</span>
-                <span class="metric-value" id="total-alerts">0</span>
-            </div>
-            <div class="metric">
-                <span>Critical:</span>
-                <span class="metric-value" id="critical-alerts">0</span>
-            </div>
-        </div>
-    </div>
-
-    <div class="chart-container">
-        <h3>📈 Cost Trends</h3>
-        <canvas id="costTrendChart"></canvas>
-    </div>
-
-    <div class="chart-container">
-        <h3>🍰 Service Breakdown</h3>
-        <canvas id="serviceChart"></canvas>
-    </div>
-
-    <div class="dashboard-grid">
-        <div class="card">
-            <h3>🔔 Recent Alerts</h3>
-            <button class="refresh-button" onclick="loadRecentAlerts()">Refresh</button>
-            <div id="recent-alerts"></div>
-        </div>
-
-        <div class="card">
-            <h3>🔍 Recent Anomalies</h3>
-            <button class="refresh-button" onclick="loadAnomalies()">Refresh</button>
-            <div id="recent-anomalies"></div>
-        </div>
-    </div>
-
-    <script>
-        // Initialize Socket.IO
-        const socket = io();
-        
-        // Charts
-        let costTrendChart, serviceChart;
-        
-        // Initialize charts
-        function initCharts() {
-            const costCtx = document.getElementById('costTrendChart').getContext('2d');
-            costTrendChart = new Chart(costCtx, {
-                type: 'line',
-                data: {
-                    labels: [],
-                    datasets: [{
-                        label: 'Daily Cost',
-                        data: [],
-                        borderColor: '#667eea',
-                        backgroundColor: 'rgba(102, 126, 234, 0.1)',
-                        tension: 0.4
-                    }]
-                },
-                options: {
-                    responsive: true,
-                    scales: {
-                        y: {
-                            beginAtZero: true
-                        }
-                    }
-                }
-            });
-
-            const serviceCtx = document.getElementById('serviceChart').getContext('2d');
-            serviceChart = new Chart(serviceCtx, {
-                type: 'doughnut',
-                data: {
-                    labels: [],
-                    datasets: [{
-                        data: [],
-                        backgroundColor: [
-                            '#667eea', '#764ba2', '#f093fb', '#f5576c',
-                            '#4facfe', '#00f2fe', '#43e97b', '#38f9d7'
-                        ]
-                    }]
-                },
-                options: {
-                    responsive: true
-                }
-            });
-        }
-
-        // Update dashboard data
-        function updateDashboard(data) {
-            // Update cost summary
-            if (data.cost_summary) {
-                document.getElementById('total-cost').textContent = 
-                    '₹' + data.cost_summary.total_cost.toFixed(2);
-                document.getElementById('data-points').textContent = 
-                    data.cost_summary.data_points;
-            }
-
-            // Update anomaly summary
-            if (data.anomaly_summary) {
-                document.getElementById('total-anomalies').textContent = 
-                    data.anomaly_summary.total_anomalies;
-                document.getElementById('high-anomalies').textContent = 
-                    data.anomaly_summary.high_severity;
-            }
-
-            // Update alert summary
-            if (data.alert_summary) {
-                document.getElementById('total-alerts').textContent = 
-                    data.alert_summary.total_alerts;
-                document.getElementById('critical-alerts').textContent = 
-                    data.alert_summary.critical_alerts;
-            }
-
-            // Update last update time
-            if (data.last_update) {
-                const updateTime = new Date(data.last_update);
-                document.getElementById('last-update').textContent = 
-                    'Last update: ' + updateTime.toLocaleTimeString();
-            }
-        }
-
-        // Load cost trends
-        async function loadCostTrends() {
-            try {
-                const response = await fetch('/api/cost-trends');
-                const trends = await response.json();
-                
-                costTrendChart.data.labels = trends.map(t => t.date);
-                costTrendChart.data.datasets[0].data = trends.map(t => t.cost);
-                costTrendChart.update();
-            } catch (error) {
-                console.error('Error loading cost trends:', error);
-            }
-        }
-
-        // Load service breakdown
-        async function loadServiceBreakdown() {
-            try {
-                const response = await fetch('/api/service-breakdown');
-                const breakdown = await response.json();
-                
-                serviceChart.data.labels = breakdown.map(s => s.service);
-                serviceChart.data.datasets[0].data = breakdown.map(s => s.cost);
-                serviceChart.update();
-            } catch (error) {
-                console.error('Error loading service breakdown:', error);
-            }
-        }
-
-        // Load recent alerts
-        async function loadRecentAlerts() {
-            try {
-                const response = await fetch('/api/recent-alerts');
-                const alerts = await response.json();
-                
-                const container = document.getElementById('recent-alerts');
-                container.innerHTML = '';
-                
-                alerts.forEach(alert => {
-                    const alertDiv = document.createElement('div');
-                    alertDiv.className = `alert-item alert-${alert.severity || 'medium'}`;
-                    alertDiv.innerHTML = `
-                        <strong>${alert.type}</strong><br>
-                        Service: ${alert.service}<br>
-                        Time: ${new Date(alert.timestamp).toLocaleString()}
-                    `;
-                    container.appendChild(alertDiv);
-                });
-            } catch (error) {
-                console.error('Error loading recent alerts:', error);
-            }
-        }
-
-        // Load anomalies
-        async function loadAnomalies() {
-            try {
-                const response = await fetch('/api/anomalies');
-                const anomalies = await response.json();
-                
-                const container = document.getElementById('recent-anomalies');
-                container.innerHTML = '';
-                
-                anomalies.forEach(anomaly => {
-                    const anomalyDiv = document.createElement('div');
-                    anomalyDiv.className = `alert-item alert-${anomaly.severity || 'medium'}`;
-                    anomalyDiv.innerHTML = `
-                        <strong>Anomaly</strong><br>
-                        Service: ${anomaly.service}<br>
-                        Score: ${anomaly.anomaly_score}<br>
-                        Time: ${new Date(anomaly.timestamp).toLocaleString()}
-                    `;
-                    container.appendChild(anomalyDiv);
-                });
-            } catch (error) {
-                console.error('Error loading anomalies:', error);
-            }
-        }
-
-        // Socket.IO event handlers
-        socket.on('connect', () => {
-            document.getElementById('status-indicator').className = 'status-indicator status-online';
-            document.getElementById('status-text').textContent = 'Connected';
-        });
-
-        socket.on('disconnect', () => {
-            document.getElementById('status-indicator').className = 'status-indicator status-offline';
-            document.getElementById('status-text').textContent = 'Disconnected';
-        });
-
-        socket.on('data_update', (data) => {
-            updateDashboard(data);
-        });
-
-        // Initialize dashboard
-        document.addEventListener('DOMContentLoaded', () => {
-            initCharts();
-            loadCostTrends();
-            loadServiceBreakdown();
-            loadRecentAlerts();
-            loadAnomalies();
-            
-            // Load initial summary
-            fetch('/api/summary')
-                .then(response => response.json())
-                .then(data => updateDashboard(data))
-                .catch(error => console.error('Error loading summary:', error));
-        });
-
-        // Auto-refresh every 30 seconds
-        setInterval(() => {
-            loadCostTrends();
-            loadServiceBreakdown();
-            loadRecentAlerts();
-            loadAnomalies();
-        }, 30000);
-    </script>
-</body>
-</html>'''
-    
-    with open(os.path.join(template_dir, 'dashboard.html'), 'w') as f:
-        f.write(dashboard_html)
-
 if __name__ == '__main__':
-    # Create templates directory and files
-    create_dashboard_templates()
-    
     # Start the dashboard
     port = int(os.environ.get('DASHBOARD_PORT', 5001))
     logger.info(f"Starting dashboard on port {port}")
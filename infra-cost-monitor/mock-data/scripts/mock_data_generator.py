@@ -4,14 +4,49 @@ Mock Data Generator for GCP Cost Monitoring System
 Creates 1 year of realistic cost data with anomalies for testing Slack alerts
 """
 
-import json
-import random
+import bisect
 import datetime
-from typing import List, Dict, Any
+from collections import Counter, defaultdict
+from operator import itemgetter
+from typing import List, Dict, Any, Optional
 import os
+import sys
+import numpy as np
+
+# Shared JSON helpers (orjson when installed)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'common'))
+from json_utils import write_json
+
+# Compile the per-record cost arithmetic when numba is installed
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, cache=True)
+    def compute_costs(base_draws, variation_draws, weekend, mins, maxs, service_idx, multipliers):
+        """Record costs from uniform [0, 1) draws: base in the service range, ±25% variation, weekend discount"""
+        out = np.empty(base_draws.size)
+        for i in prange(base_draws.size):
+            s = service_idx[i]
+            variation = 0.75 + 0.5 * variation_draws[i]
+            if weekend[i]:
+                variation *= 0.85
+            out[i] = round((mins[s] + (maxs[s] - mins[s]) * base_draws[i]) * variation * multipliers[i], 2)
+        return out
+else:
+    def compute_costs(base_draws, variation_draws, weekend, mins, maxs, service_idx, multipliers):
+        """Record costs from uniform [0, 1) draws: base in the service range, ±25% variation, weekend discount"""
+        base_cost = mins[service_idx] + (maxs[service_idx] - mins[service_idx]) * base_draws
+        variation = (0.75 + 0.5 * variation_draws) * np.where(weekend, 0.85, 1.0)
+        return np.round(base_cost * variation * multipliers, 2)
 
 class MockDataGenerator:
-    def __init__(self):
+    def __init__(self, seed: int = None):
+        self.rng = np.random.default_rng(seed)
+        
         self.services = [
             "BigQuery", "Cloud Functions", "Cloud Run", "Cloud SQL", 
             "Cloud Storage", "Compute Engine", "Kubernetes Engine", "Pub/Sub"
@@ -50,6 +85,10 @@ class MockDataGenerator:
             "Pub/Sub": {"min": 15.0, "max": 180.0}              # Message throughput + storage
         }
         
+        # Cost ranges as arrays indexed by position in self.services, for batch sampling
+        self._cost_mins = np.array([self.base_costs[s]["min"] for s in self.services])
+        self._cost_maxs = np.array([self.base_costs[s]["max"] for s in self.services])
+        
         # Define realistic anomaly patterns with moderate multipliers
         self.anomaly_patterns = [
             {"date": "2024-12-15", "service": "Compute Engine", "multiplier": 3.5, "description": "Spike in compute costs due to Black Friday traffic"},
@@ -61,6 +100,11 @@ class MockDataGenerator:
             {"date": "2025-06-25", "service": "Pub/Sub", "multiplier": 3.2, "description": "Message processing spike during event processing"},
             {"date": "2025-07-08", "service": "Cloud Run", "multiplier": 2.8, "description": "Container scaling issue during traffic surge"}
         ]
+        
+        # O(1) lookups for the anomaly dates
+        self._anomaly_dates = {p["date"] for p in self.anomaly_patterns}
+        # Sorted ISO dates for O(log n) range and nearest-date lookups
+        self._anomaly_dates_sorted = sorted(self._anomaly_dates)
 
     def generate_date_range(self, start_date: str, days: int) -> List[str]:
         """Generate list of dates from start_date for specified number of days"""
@@ -71,159 +115,125 @@ class MockDataGenerator:
             dates.append(date.strftime("%Y-%m-%d"))
         return dates
 
-    def is_anomaly_date(self, date: str, service: str) -> float:
-        """Check if date has anomaly for specific service"""
-        for pattern in self.anomaly_patterns:
-            if pattern["date"] == date and pattern["service"] == service:
-                return pattern["multiplier"]
-        return 1.0
+    def anomaly_dates_between(self, start_date: str, end_date: str) -> List[str]:
+        """Anomaly dates within [start_date, end_date] (inclusive, YYYY-MM-DD)"""
+        lo = bisect.bisect_left(self._anomaly_dates_sorted, start_date)
+        hi = bisect.bisect_right(self._anomaly_dates_sorted, end_date)
+        return self._anomaly_dates_sorted[lo:hi]
 
-    def generate_realistic_cost(self, service: str, base_multiplier: float = 1.0) -> float:
-        """Generate realistic cost with some randomness"""
-        base_range = self.base_costs[service]
-        base_cost = random.uniform(base_range["min"], base_range["max"])
-        
-        # Add some daily variation (±25%)
-        daily_variation = random.uniform(0.75, 1.25)
+    def nearest_anomaly(self, date: str) -> Optional[str]:
+        """Closest anomaly date to date (the earlier one on a tie), or None if there are none"""
+        dates = self._anomaly_dates_sorted
+        i = bisect.bisect_left(dates, date)
+        candidates = dates[max(i - 1, 0):i + 1]
+        if not candidates:
+            return None
+        target = datetime.date.fromisoformat(date)
+        return min(candidates, key=lambda d: abs((datetime.date.fromisoformat(d) - target).days))
+
+    def _sample_records(self, dates: np.ndarray, service_idx: np.ndarray,
+                        multipliers: np.ndarray) -> List[Dict[str, Any]]:
+        """Sample SKU/project/region and cost for aligned arrays of dates, services and multipliers"""
+        n = len(dates)
+        sku_idx = self.rng.integers(0, len(self.skus), n)
+        project_idx = self.rng.integers(0, len(self.projects), n)
+        region_idx = self.rng.integers(0, len(self.regions), n)
         
-        # Add weekend effect (lower costs on weekends)
-        current_date = datetime.datetime.now()
-        if current_date.weekday() >= 5:  # Weekend
-            daily_variation *= 0.85
+        # Base cost within the service's range, daily variation (±25%) and a weekend
+        # discount applied per record date rather than by today's weekday
+        base_draws = self.rng.random(n)
+        variation_draws = self.rng.random(n)
+        day_of_week = (np.array(dates, dtype='datetime64[D]').astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday
+        costs = compute_costs(base_draws, variation_draws, day_of_week >= 5, self._cost_mins, self._cost_maxs,
+                              np.asarray(service_idx, dtype=np.int64), np.asarray(multipliers, dtype=np.float64))
         
-        return round(base_cost * daily_variation * base_multiplier, 2)
+        return [
+            {
+                "service_desc": self.services[s],
+                "sku_desc": self.skus[k],
+                "project_id": self.projects[p],
+                "region": self.regions[r],
+                "date": date,
+                "cost": cost
+            }
+            for s, k, p, r, date, cost in zip(service_idx.tolist(), sku_idx.tolist(),
+                                              project_idx.tolist(), region_idx.tolist(),
+                                              dates.tolist(), costs.tolist())
+        ]
 
     def generate_composite_data(self, start_date: str = "2024-07-01", days: int = 365) -> List[Dict[str, Any]]:
         """Generate composite cost data for specified period"""
         dates = self.generate_date_range(start_date, days)
-        composite_data = []
         
         print(f"Generating {days} days of composite data from {start_date}...")
         
-        # First, ensure anomaly dates have records for their services
-        anomaly_dates_processed = set()
+        # First, ensure anomaly dates have 3-5 records for their services
+        anomaly_counts = self.rng.integers(3, 6, len(self.anomaly_patterns))
+        composite_data = self._sample_records(
+            np.repeat([p["date"] for p in self.anomaly_patterns], anomaly_counts),
+            np.repeat([self.services.index(p["service"]) for p in self.anomaly_patterns], anomaly_counts),
+            np.repeat([p["multiplier"] for p in self.anomaly_patterns], anomaly_counts)
+        )
         
-        for pattern in self.anomaly_patterns:
-            anomaly_date = pattern["date"]
-            anomaly_service = pattern["service"]
-            anomaly_multiplier = pattern["multiplier"]
-            
-            # Generate 3-5 records for this anomaly
-            for _ in range(random.randint(3, 5)):
-                sku = random.choice(self.skus)
-                project = random.choice(self.projects)
-                region = random.choice(self.regions)
-                
-                cost = self.generate_realistic_cost(anomaly_service, anomaly_multiplier)
-                
-                record = {
-                    "service_desc": anomaly_service,
-                    "sku_desc": sku,
-                    "project_id": project,
-                    "region": region,
-                    "date": anomaly_date,
-                    "cost": cost
-                }
-                composite_data.append(record)
-            
-            anomaly_dates_processed.add(anomaly_date)
-        
-        # Then generate regular data for all dates
-        for date in dates:
-            # Skip dates that already have anomaly records
-            if date in anomaly_dates_processed:
-                continue
-                
-            # Generate 3-8 records per day
-            daily_records = random.randint(3, 8)
-            
-            for _ in range(daily_records):
-                service = random.choice(self.services)
-                sku = random.choice(self.skus)
-                project = random.choice(self.projects)
-                region = random.choice(self.regions)
-                
-                # Check for anomalies (should be 1.0 for non-anomaly dates)
-                anomaly_multiplier = self.is_anomaly_date(date, service)
-                cost = self.generate_realistic_cost(service, anomaly_multiplier)
-                
-                record = {
-                    "service_desc": service,
-                    "sku_desc": sku,
-                    "project_id": project,
-                    "region": region,
-                    "date": date,
-                    "cost": cost
-                }
-                
-                composite_data.append(record)
+        # Then generate 3-8 regular records per day, skipping dates that already have anomaly records
+        regular_dates = [date for date in dates if date not in self._anomaly_dates]
+        daily_counts = self.rng.integers(3, 9, len(regular_dates))
+        record_dates = np.repeat(np.array(regular_dates, dtype=object), daily_counts)
+        service_idx = self.rng.integers(0, len(self.services), len(record_dates))
         
-        # Sort by date
-        composite_data.sort(key=lambda x: x["date"])
+        # Regular dates exclude every anomaly date, so no multiplier applies here
+        composite_data.extend(self._sample_records(record_dates, service_idx, np.ones(len(record_dates))))
+        
+        # Sort by date; both batches are already date-ordered runs, so this is a cheap merge
+        composite_data.sort(key=itemgetter("date"))
         
         print(f"Generated {len(composite_data)} composite records")
         return composite_data
 
-    def generate_daily_totals(self, composite_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Generate daily total cost data from composite data"""
-        daily_costs = {}
+    def generate_daily_and_mtd(self, composite_data: List[Dict[str, Any]]):
+        """Generate daily totals and month-to-date data in a single pass over composite data"""
+        daily_costs = Counter()
+        monthly_costs = Counter()
         
         for record in composite_data:
             date = record["date"]
-            cost = record["cost"]
-            
-            if date not in daily_costs:
-                daily_costs[date] = 0.0
-            daily_costs[date] += cost
+            month_key = date[:7].replace("-", "")  # YYYY-MM-DD -> YYYYMM
+            daily_costs[date] += record["cost"]
+            monthly_costs[month_key] += record["cost"]
+        
+        # Each distinct date counts once towards its month
+        monthly_days = Counter(date[:7].replace("-", "") for date in daily_costs)
         
         daily_data = [
             {"date": date, "cost": round(cost, 2)}
             for date, cost in sorted(daily_costs.items())
         ]
-        
-        print(f"Generated {len(daily_data)} daily total records")
-        return daily_data
-
-    def generate_mtd_data(self, daily_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Generate month-to-date cost data"""
-        monthly_costs = {}
-        
-        for record in daily_data:
-            date = datetime.datetime.strptime(record["date"], "%Y-%m-%d")
-            month_key = date.strftime("%Y%m")
-            cost = record["cost"]
-            
-            if month_key not in monthly_costs:
-                monthly_costs[month_key] = {"cost": 0.0, "days": 0}
-            
-            monthly_costs[month_key]["cost"] += cost
-            monthly_costs[month_key]["days"] += 1
-        
         mtd_data = [
             {
                 "month": month,
-                "cost": round(data["cost"], 2),
-                "days": data["days"]
+                "cost": round(cost, 2),
+                "days": monthly_days[month]
             }
-            for month, data in sorted(monthly_costs.items(), reverse=True)
+            for month, cost in sorted(monthly_costs.items(), reverse=True)
         ]
         
+        print(f"Generated {len(daily_data)} daily total records")
         print(f"Generated {len(mtd_data)} MTD records")
-        return mtd_data
+        return daily_data, mtd_data
 
     def generate_anomalies(self, composite_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Generate anomaly records based on anomaly patterns"""
         anomalies = []
         
+        # One pass over the records: total cost per (date, service)
+        totals = defaultdict(float)
+        for record in composite_data:
+            totals[(record["date"], record["service_desc"])] += record["cost"]
+        
         for pattern in self.anomaly_patterns:
-            # Find records for this anomaly
-            anomaly_records = [
-                record for record in composite_data
-                if record["date"] == pattern["date"] and record["service_desc"] == pattern["service"]
-            ]
-            
-            if anomaly_records:
-                total_cost = sum(record["cost"] for record in anomaly_records)
+            key = (pattern["date"], pattern["service"])
+            if key in totals:
+                total_cost = totals[key]
                 
                 anomaly = {
                     "date": pattern["date"],
@@ -277,8 +287,7 @@ class MockDataGenerator:
         
         # Generate data
         composite_data = self.generate_composite_data()
-        daily_data = self.generate_daily_totals(composite_data)
-        mtd_data = self.generate_mtd_data(daily_data)
+        daily_data, mtd_data = self.generate_daily_and_mtd(composite_data)
         anomalies = self.generate_anomalies(composite_data)
         summary = self.generate_summary(composite_data, daily_data, mtd_data, anomalies)
         
@@ -298,8 +307,8 @@ class MockDataGenerator:
         
         for filename, data in files_to_save.items():
             filepath = os.path.join(output_dir, filename)
-            with open(filepath, 'w') as f:
-                json.dump(data, f, indent=2)
+            # Compact; these files are read by the pipeline, not by people
+            write_json(filepath, data)
             print(f"✅ Saved {filename}")
         
         # Print anomaly summary for testing
@@ -8,26 +8,109 @@ Connects to existing Chroma database and provides semantic search capabilities
 import logging
 import re
 import threading
-import queue
-from typing import Dict, List, Any, Optional
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Generator, List, Any, Optional
+import numpy as np
+import sqlite_patch  # must precede chromadb
 import chromadb
 from chromadb.config import Settings
+from chromadb.utils import embedding_functions
+import httpx
 import ollama
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Compiled once; these run on every Slack query
+_COST_RE = re.compile(r'₹([\d,]+\.?\d*)')
+_WHITESPACE_RE = re.compile(r"\s+")
+_WORD_RE = re.compile(r"\w+")
+
+# Query keywords, matched against whole words ('high cost' and 'most expensive' are covered by their parts)
+_EXPENSIVE_KW = frozenset({'expensive', 'cost', 'costs', 'costly'})
+_ANOMALY_KW = frozenset({'anomaly', 'anomalies', 'unusual', 'alert', 'alerts'})
+_TREND_KW = frozenset({'trend', 'trends', 'trending', 'daily', 'month', 'monthly'})
+_LLM_KW = frozenset({'why', 'how', 'explain', 'analyze'})
+
+# Static parts of the LLM prompt; only the context and question are filled in per query
+_PROMPT_PREFIX = "GCP Cost Assistant. Context: "
+_PROMPT_SUFFIX = ". Provide a brief, helpful response:"
+
+# Keep the model resident between queries so each request skips the model load
+_LLM_MODEL = 'llama3.2'
+_LLM_KEEP_ALIVE = '10m'
+_LLM_OPTIONS = {'num_predict': 150, 'num_ctx': 1024, 'temperature': 0.2}
+
+def _normalize_query(query: str) -> str:
+    """Cache key form of a query: lowercased with whitespace collapsed"""
+    return _WHITESPACE_RE.sub(" ", query.strip().lower())
+
+def tee_stream(stream: Generator[str, None, bool], parts: List[str]) -> Generator[str, None, bool]:
+    """Re-yield a response stream, appending each chunk to parts; returns the stream's cacheable flag"""
+    while True:
+        try:
+            chunk = next(stream)
+        except StopIteration as stop:
+            return bool(stop.value)
+        parts.append(chunk)
+        yield chunk
+
+class _TTLCache:
+    """Thread-safe LRU cache whose entries expire after ttl seconds"""
+    
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+    
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
 class RAGIntegration:
-    def __init__(self, chroma_dir: str = "../ai_ml/chroma_db"):
+    # Repeated questions are answered from cache; entries expire so cost answers stay fresh
+    _QUERY_CACHE_SIZE = 512
+    _QUERY_CACHE_TTL_SECONDS = 300
+    # Document counts only change when the ingest pipeline runs; a short TTL absorbs /cost-stats bursts
+    _STATS_CACHE_TTL_SECONDS = 30
+    
+    def __init__(self, chroma_dir: str = "../ai_ml/chroma_db", llm_timeout: int = 10):
         """
         Initialize RAG integration with existing Chroma database
         
         Args:
             chroma_dir: Path to the Chroma database directory
+            llm_timeout: Timeout in seconds for Ollama requests
         """
         self.chroma_dir = chroma_dir
         
+        # One embedding function for both collections, so a query is embedded once per search
+        self.embedding_function = embedding_functions.DefaultEmbeddingFunction()
+        
+        # The two collection searches run side by side
+        self._query_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="chroma-query")
+        
+        self._search_cache = _TTLCache(self._QUERY_CACHE_SIZE, self._QUERY_CACHE_TTL_SECONDS)
+        self._response_cache = _TTLCache(self._QUERY_CACHE_SIZE, self._QUERY_CACHE_TTL_SECONDS)
+        self._stats_cache = _TTLCache(1, self._STATS_CACHE_TTL_SECONDS)
+        
         # Initialize Chroma client
         logger.info("Initializing RAG integration with Chroma...")
         try:
@@ -38,91 +121,110 @@ class RAGIntegration:
             
             # Get existing collections
             collections = self.chroma_client.list_collections()
-            logger.info(f"Found collections: {[col.name for col in collections]}")
+            logger.info("Found collections: %s", [col.name for col in collections])
             
             # Connect to existing collections
             try:
-                self.cost_collection = self.chroma_client.get_collection("cost_data")
+                self.cost_collection = self.chroma_client.get_collection(
+                    "cost_data", embedding_function=self.embedding_function
+                )
                 logger.info("Connected to cost_data collection")
             except Exception:
                 logger.warning("cost_data collection not found, creating...")
-                self.cost_collection = self.chroma_client.create_collection("cost_data")
+                self.cost_collection = self.chroma_client.create_collection(
+                    "cost_data", embedding_function=self.embedding_function
+                )
             
             try:
-                self.anomaly_collection = self.chroma_client.get_collection("anomaly_data")
+                self.anomaly_collection = self.chroma_client.get_collection(
+                    "anomaly_data", embedding_function=self.embedding_function
+                )
                 logger.info("Connected to anomaly_data collection")
             except Exception:
                 logger.warning("anomaly_data collection not found, creating...")
-                self.anomaly_collection = self.chroma_client.create_collection("anomaly_data")
+                self.anomaly_collection = self.chroma_client.create_collection(
+                    "anomaly_data", embedding_function=self.embedding_function
+                )
             
             logger.info("RAG integration initialized successfully")
             
         except Exception as e:
-            logger.error(f"Error initializing RAG integration: {e}")
+            logger.error("Error initializing RAG integration: %s", e)
             raise
         
-        # Initialize Ollama
+        # Initialize Ollama; the HTTP transport enforces the timeout and closes the request
+        self._ollama = ollama.Client(timeout=llm_timeout)
         try:
-            ollama.list()
+            self._ollama.list()
             logger.info("Connected to Ollama")
         except Exception as e:
-            logger.error(f"Error connecting to Ollama: {e}")
+            logger.error("Error connecting to Ollama: %s", e)
             logger.warning("LLM features will be limited")
     
-    def search_relevant_data(self, query: str, n_results: int = 3) -> List[Dict[str, Any]]:
+    def embed(self, query: str) -> np.ndarray:
+        """Unit-length embedding of a query, so dot products are cosine similarities"""
+        embedding = np.asarray(self.embedding_function([query])[0], dtype=np.float32)
+        return embedding / (np.linalg.norm(embedding) or 1.0)
+    
+    def search_relevant_data(self, query: str, n_results: int = 3,
+                             query_embedding: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
         """
         Search for relevant cost data using vector similarity
         
         Args:
             query: User's question
             n_results: Number of results to return
+            query_embedding: Precomputed embedding of the query, if the caller has one
             
         Returns:
             List of relevant documents with metadata
         """
+        cache_key = (_normalize_query(query), n_results)
+        cached = self._search_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
-            logger.info(f"Searching for: {query}")
-            
-            # Search in both collections
-            cost_results = self.cost_collection.query(
-                query_texts=[query],
-                n_results=n_results
-            )
+            logger.info("Searching for: %s", query)
             
-            anomaly_results = self.anomaly_collection.query(
-                query_texts=[query],
-                n_results=n_results
+            # Embed once, then search both collections concurrently with the same vector
+            if query_embedding is not None:
+                query_embeddings = [query_embedding.tolist()]
+            else:
+                query_embeddings = self.embedding_function([query])
+            cost_results, anomaly_results = self._query_pool.map(
+                lambda collection: collection.query(
+                    query_embeddings=query_embeddings,
+                    n_results=n_results
+                ),
+                (self.cost_collection, self.anomaly_collection)
             )
             
-            # Combine and format results
-            relevant_data = []
-            
-            if cost_results['documents']:
-                for i, doc in enumerate(cost_results['documents'][0]):
-                    relevant_data.append({
-                        'text': doc,
-                        'metadata': cost_results['metadatas'][0][i],
-                        'type': 'cost_data',
-                        'distance': cost_results['distances'][0][i] if 'distances' in cost_results else None
-                    })
-            
-            if anomaly_results['documents']:
-                for i, doc in enumerate(anomaly_results['documents'][0]):
-                    relevant_data.append({
-                        'text': doc,
-                        'metadata': anomaly_results['metadatas'][0][i],
-                        'type': 'anomaly',
-                        'distance': anomaly_results['distances'][0][i] if 'distances' in anomaly_results else None
-                    })
+            # Combine the column-wise results, sort by distance, then build one dict per hit
+            texts, metadatas, types, distances = [], [], [], []
+            for results, doc_type in ((cost_results, 'cost_data'), (anomaly_results, 'anomaly')):
+                if results['documents']:
+                    docs = results['documents'][0]
+                    texts += docs
+                    metadatas += results['metadatas'][0]
+                    types += [doc_type] * len(docs)
+                    distances += results['distances'][0] if results.get('distances') else [1.0] * len(docs)
             
-            # Sort by relevance (lower distance = more relevant)
-            relevant_data.sort(key=lambda x: x.get('distance', 1.0))
+            # Sort by relevance (lower distance = more relevant); all hits are kept so
+            # generate_fast_response can still pick out each document type
+            order = np.argsort(np.asarray(distances, dtype=np.float64), kind='stable')
+            relevant_data = [
+                {'text': texts[i], 'metadata': metadatas[i], 'type': types[i], 'distance': distances[i]}
+                for i in order.tolist()
+            ]
             
-            logger.info(f"Found {len(relevant_data)} relevant documents")
+            logger.info("Found %s relevant documents", len(relevant_data))
+            if relevant_data:
+                self._search_cache.set(cache_key, relevant_data)
             return relevant_data
             
         except Exception as e:
-            logger.error(f"Error searching data: {e}")
+            logger.error("Error searching data: %s", e)
             return []
     
     def generate_fast_response(self, query: str, relevant_data: List[Dict[str, Any]]) -> str:
@@ -136,17 +238,17 @@ class RAGIntegration:
         Returns:
             Formatted response string
         """
-        query_lower = query.lower()
+        tokens = set(_WORD_RE.findall(query.lower()))
         
         # Check for common patterns and provide instant responses
-        if any(word in query_lower for word in ['expensive', 'cost', 'high cost', 'most expensive']):
+        if tokens & _EXPENSIVE_KW:
             cost_items = [item for item in relevant_data if item['type'] == 'cost_data']
             if cost_items:
                 costs = []
                 for item in cost_items:
                     text = item['text']
                     if '₹' in text:
-                        cost_match = re.search(r'₹([\d,]+\.?\d*)', text)
+                        cost_match = _COST_RE.search(text)
                         if cost_match:
                             cost_val = float(cost_match.group(1).replace(',', ''))
                             costs.append((cost_val, text))
@@ -158,7 +260,7 @@ class RAGIntegration:
                         response += f"{i+1}. {text}\n"
                     return response
         
-        elif any(word in query_lower for word in ['anomaly', 'anomalies', 'unusual', 'alert']):
+        elif tokens & _ANOMALY_KW:
             anomaly_items = [item for item in relevant_data if item['type'] == 'anomaly']
             if anomaly_items:
                 response = "*Recent Anomalies Detected:*\n"
@@ -166,7 +268,7 @@ class RAGIntegration:
                     response += f"{i+1}. {item['text']}\n"
                 return response
         
-        elif any(word in query_lower for word in ['trend', 'trends', 'daily', 'month']):
+        elif tokens & _TREND_KW:
             cost_items = [item for item in relevant_data if item['type'] == 'cost_data']
             if cost_items:
                 response = "*Recent Cost Trends:*\n"
@@ -183,83 +285,109 @@ class RAGIntegration:
         
         return "I couldn't find specific data for your question. Try asking about 'expensive services', 'anomalies', or 'cost trends'."
     
-    def generate_llm_response(self, query: str, relevant_data: List[Dict[str, Any]], timeout: int = 10) -> str:
+    def generate_llm_response(self, query: str, relevant_data: List[Dict[str, Any]]) -> str:
         """
         Generate response using Ollama LLM with timeout
         
         Args:
             query: User's question
             relevant_data: Retrieved relevant documents
-            timeout: Timeout in seconds
             
         Returns:
             LLM-generated response or fallback response
         """
+        return "".join(self.generate_llm_response_stream(query, relevant_data))
+    
+    def generate_llm_response_stream(self, query: str,
+                                     relevant_data: List[Dict[str, Any]]) -> Generator[str, None, bool]:
+        """
+        Stream the LLM response as it is decoded, falling back to the fast
+        response if the LLM fails or finishes without producing any text. Returns
+        True only if the LLM finished normally with a non-empty answer
+        """
+        streamed = False
         try:
             # Prepare context
             context_items = relevant_data[:2]
             context = "\n".join([item['text'] for item in context_items])
             
             # Create prompt
-            prompt = f"""GCP Cost Assistant. Context: {context[:300]}... Question: {query}. Provide a brief, helpful response:"""
-            
-            # Try LLM with timeout
-            result_queue = queue.Queue()
-            
-            def llm_call():
-                try:
-                    response = ollama.chat(model='llama3.2', messages=[
-                        {'role': 'user', 'content': prompt}
-                    ])
-                    result_queue.put(response['message']['content'])
-                except Exception as e:
-                    result_queue.put(f"LLM Error: {str(e)}")
-            
-            # Start LLM in thread
-            thread = threading.Thread(target=llm_call)
-            thread.daemon = True
-            thread.start()
-            thread.join(timeout=timeout)
+            prompt = _PROMPT_PREFIX + context[:300] + "... Question: " + query + _PROMPT_SUFFIX
             
-            if thread.is_alive():
-                return self.generate_fast_response(query, relevant_data) + "\n\n_(LLM response timed out, showing data summary above)_"
-            
-            llm_result = result_queue.get_nowait()
-            if "LLM Error" in llm_result:
-                return self.generate_fast_response(query, relevant_data)
-            
-            return llm_result
+            for part in self._ollama.generate(model=_LLM_MODEL, prompt=prompt, stream=True,
+                                              keep_alive=_LLM_KEEP_ALIVE, options=_LLM_OPTIONS):
+                if part['response']:
+                    streamed = True
+                    yield part['response']
+            if streamed:
+                return True
+            yield self.generate_fast_response(query, relevant_data)
             
+        except httpx.TimeoutException:
+            if streamed:
+                yield "\n\n_(LLM response timed out)_"
+            else:
+                yield self.generate_fast_response(query, relevant_data) + "\n\n_(LLM response timed out, showing data summary above)_"
         except Exception as e:
-            logger.error(f"Error generating LLM response: {e}")
-            return self.generate_fast_response(query, relevant_data)
+            logger.error("Error generating LLM response: %s", e)
+            if not streamed:
+                yield self.generate_fast_response(query, relevant_data)
+        return False
     
-    def process_query(self, query: str, use_llm: bool = True) -> str:
+    def process_query(self, query: str, use_llm: bool = True,
+                      query_embedding: Optional[np.ndarray] = None) -> str:
         """
         Process a user query and return a response
         
         Args:
             query: User's question
             use_llm: Whether to use LLM for complex questions
+            query_embedding: Precomputed embedding of the query, if the caller has one
             
         Returns:
             Formatted response string
         """
-        logger.info(f"Processing query: {query}")
+        return "".join(self.process_query_stream(query, use_llm, query_embedding))
+    
+    def cached_response(self, query: str, use_llm: bool = True) -> Optional[str]:
+        """Response cached for this query (after normalization), if any"""
+        return self._response_cache.get((_normalize_query(query), use_llm))
+    
+    def process_query_stream(self, query: str, use_llm: bool = True,
+                             query_embedding: Optional[np.ndarray] = None) -> Generator[str, None, bool]:
+        """
+        Process a user query, yielding the response in chunks as the LLM decodes it;
+        cached and non-LLM responses arrive as a single chunk. Returns whether the
+        response is worth caching (data was found and the LLM did not fall back)
+        """
+        logger.info("Processing query: %s", query)
+        
+        cached = self.cached_response(query, use_llm)
+        if cached is not None:
+            yield cached
+            return True
         
         # Search for relevant data
-        relevant_data = self.search_relevant_data(query)
+        relevant_data = self.search_relevant_data(query, query_embedding=query_embedding)
         
         if not relevant_data:
-            return "I couldn't find any relevant cost data for your question. Try asking about 'cost trends', 'anomalies', or 'daily costs'."
+            yield "I couldn't find any relevant cost data for your question. Try asking about 'cost trends', 'anomalies', or 'daily costs'."
+            return False
         
         # Generate response
-        if use_llm and any(word in query.lower() for word in ['why', 'how', 'explain', 'analyze']):
-            response = self.generate_llm_response(query, relevant_data)
+        if use_llm and _LLM_KW.intersection(_WORD_RE.findall(query.lower())):
+            parts = []
+            cacheable = yield from tee_stream(self.generate_llm_response_stream(query, relevant_data), parts)
+            response = "".join(parts)
         else:
             response = self.generate_fast_response(query, relevant_data)
+            cacheable = True
+            yield response
         
-        return response
+        # Degraded (timed out or fallback) and empty answers are retried on the next ask
+        if cacheable and response:
+            self._response_cache.set((_normalize_query(query), use_llm), response)
+        return cacheable and bool(response)
     
     def get_collection_stats(self) -> Dict[str, Any]:
         """
@@ -268,6 +396,10 @@ class RAGIntegration:
         Returns:
             Dictionary with collection statistics
         """
+        stats = self._stats_cache.get('stats')
+        if stats is not None:
+            return stats
+        
         try:
             stats = {}
             
@@ -282,8 +414,9 @@ class RAGIntegration:
             stats['total_documents'] = cost_count + anomaly_count
             stats['collections'] = ['cost_data', 'anomaly_data']
             
+            self._stats_cache.set('stats', stats)
             return stats
             
         except Exception as e:
-            logger.error(f"Error getting collection stats: {e}")
+            logger.error("Error getting collection stats: %s", e)
             return {'error': str(e)} 
\ No newline at end of file
@@ -4,20 +4,17 @@
 Wrapper script to run Slack bot with SQLite patch
 """
 
-# Disable CoreML to fix ONNX Runtime issues on macOS
-import os
-os.environ['ONNXRUNTIME_PROVIDER'] = 'CPUExecutionProvider'
-
 import sys
 
-# Apply SQLite patch first
-try:
-    import pysqlite3
-    sys.modules['sqlite3'] = pysqlite3
-    print("✅ Using pysqlite3 with SQLite 3.50.1")
-except ImportError:
+# Apply SQLite patch and ONNX Runtime settings before the bot imports Chroma
+import sqlite_patch
+
+# Report which sqlite3 the patch left in place
+_sqlite = sys.modules.get('sqlite3')
+if _sqlite is not None and _sqlite.__name__ == 'pysqlite3':
+    print(f"✅ Using pysqlite3 with SQLite {_sqlite.sqlite_version}")
+else:
     print("❌ pysqlite3 not available, using system sqlite3")
-    print("⚠️  You may need to run the AI/ML pipeline first to ensure compatibility")
 
 # Now run the Slack bot
 if __name__ == "__main__":
@@ -4,19 +4,16 @@ Wrapper script for Slack bot that applies SQLite patch before imports
 """
 
 import sys
-import os
 
-# Apply SQLite patch before any other imports
-try:
-    import pysqlite3
-    sys.modules['sqlite3'] = pysqlite3
-    print("Applied SQLite patch using pysqlite3")
-except ImportError:
-    print("Warning: pysqlite3 not available, using system sqlite3")
+# Apply SQLite patch and ONNX Runtime settings before the bot imports Chroma
+import sqlite_patch
 
-# Set environment variables to disable CoreML
-os.environ['ONNXRUNTIME_PROVIDER'] = 'CPUExecutionProvider'
-os.environ['ONNXRUNTIME_DISABLE_COREML'] = '1'
+# Report which sqlite3 the patch left in place
+_sqlite = sys.modules.get('sqlite3')
+if _sqlite is not None and _sqlite.__name__ == 'pysqlite3':
+    print(f"✅ Using pysqlite3 with SQLite {_sqlite.sqlite_version}")
+else:
+    print("❌ pysqlite3 not available, using system sqlite3")
 
 # Now import and run the Slack bot
 if __name__ == "__main__":
@@ -6,27 +6,141 @@ Provides RAG-powered cost monitoring via Slack commands and interactions
 """
 
 import os
+import re
 import logging
-from typing import Dict, Any
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterator, Optional
+import numpy as np
 from slack_bolt import App
 from slack_bolt.adapter.socket_mode import SocketModeHandler
 from dotenv import load_dotenv
-from rag_integration import RAGIntegration
+from rag_integration import RAGIntegration, tee_stream, _normalize_query
 
 # Load environment variables
 load_dotenv()
+_BOT_TOKEN = os.environ.get("SLACK_BOT_TOKEN")
+_SIGNING_SECRET = os.environ.get("SLACK_SIGNING_SECRET")
+_APP_TOKEN = os.environ.get("SLACK_APP_TOKEN")
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Markdown bold (**text**) becomes Slack bold (*text*); lists and code spans are already Slack-compatible
+_SLACK_BOLD_RE = re.compile(r'\*\*')
+
+# Leading bot mention in app_mention text, e.g. "<@U123456> "
+_MENTION_RE = re.compile(r'^\s*<@[UW][A-Z0-9]+>\s*')
+
+_HELP_TEXT = """🤖 *GCP Cost Monitor Bot Help*
+
+*Commands:*
+• `/cost-query <question>` - Ask about your costs
+• `/cost-stats` - Get data statistics
+• `/cost-help` - Show this help
+
+*Example Questions:*
+• "Which services are most expensive?"
+• "Show me recent anomalies"
+• "What are the cost trends?"
+• "How much did we spend yesterday?"
+• "Which projects have the highest costs?"
+
+*Features:*
+• Real-time cost data analysis
+• Anomaly detection insights
+• Trend analysis
+• Service-level breakdowns
+
+*Tips:*
+• Be specific in your questions
+• Ask about specific services, projects, or time periods
+• Use natural language - I understand context!"""
+
+_ERROR_REPLY = "Sorry, I encountered an error processing your request. Please try again."
+
+_STATS_TEMPLATE = """📊 *Cost Data Statistics:*
+• Total Documents: {total_documents}
+• Cost Data Records: {cost_data_count}
+• Anomaly Records: {anomaly_data_count}
+• Collections: {collections}"""
+
+# Common questions (the /cost-help examples) answered at startup so the first users hit warm caches
+_WARMUP_QUERIES = (
+    "Which services are most expensive?",
+    "Show me recent anomalies",
+    "What are the cost trends?",
+    "How much did we spend yesterday?",
+    "Which projects have the highest costs?",
+)
+
+class _SemanticCache:
+    """
+    LRU of responses looked up by the cached query whose embedding is most
+    similar to the new one; exact repeats are answered by RAGIntegration's own cache
+    """
+    
+    def __init__(self, maxsize: int, ttl: float, threshold: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self._entries = OrderedDict()  # key -> (slot, response)
+        self._embeddings = None  # (maxsize, dim) unit vectors, allocated on first insert
+        self._expires_at = np.full(maxsize, -np.inf)  # per slot, so expired entries never match
+        self._slot_keys = [None] * maxsize
+        self._lock = threading.Lock()
+    
+    def get_similar(self, embedding: np.ndarray) -> Optional[str]:
+        """Response cached for the nearest live query, if its cosine similarity reaches the threshold"""
+        with self._lock:
+            if self._embeddings is None or not self._entries:
+                return None
+            n = len(self._entries)
+            sims = self._embeddings[:n] @ embedding
+            sims[self._expires_at[:n] < time.monotonic()] = -np.inf
+            best = int(np.argmax(sims))
+            if sims[best] < self.threshold:
+                return None
+            key = self._slot_keys[best]
+            self._entries.move_to_end(key)
+            return self._entries[key][1]
+    
+    def put(self, key: str, embedding: np.ndarray, response: str):
+        with self._lock:
+            if key in self._entries:
+                slot = self._entries.pop(key)[0]
+            elif len(self._entries) >= self.maxsize:
+                # Evict the least recently used entry and reuse its embedding slot
+                slot = self._entries.popitem(last=False)[1][0]
+            else:
+                slot = len(self._entries)
+            
+            if self._embeddings is None:
+                self._embeddings = np.zeros((self.maxsize, embedding.size), dtype=np.float32)
+            self._embeddings[slot] = embedding
+            self._expires_at[slot] = time.monotonic() + self.ttl
+            self._slot_keys[slot] = key
+            self._entries[key] = (slot, response)
+
 class GCPCostSlackBot:
+    # Near-duplicate questions are answered from cache; entries expire so cost answers stay fresh
+    _SEMANTIC_CACHE_SIZE = 512
+    _SEMANTIC_CACHE_TTL_SECONDS = 300
+    _SEMANTIC_MATCH_THRESHOLD = 0.95
+    # Queries run on worker threads so handlers return (and Slack is acked) right away;
+    # beyond the pending limit new queries are turned away instead of queueing without bound
+    _QUERY_WORKERS = 8
+    _MAX_PENDING_QUERIES = 64
+    # Streamed answers edit the posted message after every this many new characters
+    _STREAM_UPDATE_CHARS = 200
+    
     def __init__(self):
         """Initialize the Slack bot with RAG integration"""
         # Initialize Slack app
         self.app = App(
-            token=os.environ.get("SLACK_BOT_TOKEN"),
-            signing_secret=os.environ.get("SLACK_SIGNING_SECRET")
+            token=_BOT_TOKEN,
+            signing_secret=_SIGNING_SECRET
         )
         
         # Initialize RAG integration
@@ -34,9 +148,15 @@ class GCPCostSlackBot:
             self.rag = RAGIntegration()
             logger.info("RAG integration initialized successfully")
         except Exception as e:
-            logger.error(f"Failed to initialize RAG integration: {e}")
+            logger.error("Failed to initialize RAG integration: %s", e)
             self.rag = None
         
+        self._semantic_cache = _SemanticCache(self._SEMANTIC_CACHE_SIZE, self._SEMANTIC_CACHE_TTL_SECONDS,
+                                              self._SEMANTIC_MATCH_THRESHOLD)
+        
+        self._query_pool = ThreadPoolExecutor(max_workers=self._QUERY_WORKERS, thread_name_prefix="slack-query")
+        self._pending_queries = threading.BoundedSemaphore(self._MAX_PENDING_QUERIES)
+        
         # Register event handlers
         self._register_handlers()
         
@@ -47,29 +167,28 @@ class GCPCostSlackBot:
         
         # Handle app mentions
         @self.app.event("app_mention")
-        def handle_app_mention(event, say):
+        def handle_app_mention(event, say, client):
             """Handle when the bot is mentioned"""
             try:
                 # Extract the query from the mention
                 text = event['text']
                 # Remove the bot mention (e.g., "<@U123456> ")
-                query = ' '.join(text.split()[1:])
+                query = _MENTION_RE.sub('', text, count=1).strip()
                 
-                if not query.strip():
+                if not query:
                     say("👋 Hi! I'm your GCP cost monitoring assistant. Ask me about your infrastructure costs!")
                     return
                 
-                # Process the query
-                response = self._process_query(query)
-                say(response)
+                # Answer on a worker thread, streaming into the posted message
+                self._submit_query(query, say, client)
                 
             except Exception as e:
-                logger.error(f"Error handling app mention: {e}")
-                say("Sorry, I encountered an error processing your request. Please try again.")
+                logger.error("Error handling app mention: %s", e)
+                say(_ERROR_REPLY)
         
         # Handle direct messages
         @self.app.event("message")
-        def handle_direct_message(event, say):
+        def handle_direct_message(event, say, client):
             """Handle direct messages to the bot"""
             try:
                 # Only respond to direct messages (not in channels)
@@ -80,13 +199,12 @@ class GCPCostSlackBot:
                         say("👋 Hi! I'm your GCP cost monitoring assistant. Ask me about your infrastructure costs!")
                         return
                     
-                    # Process the query
-                    response = self._process_query(query)
-                    say(response)
+                    # Answer on a worker thread, streaming into the posted message
+                    self._submit_query(query, say, client)
                     
             except Exception as e:
-                logger.error(f"Error handling direct message: {e}")
-                say("Sorry, I encountered an error processing your request. Please try again.")
+                logger.error("Error handling direct message: %s", e)
+                say(_ERROR_REPLY)
         
         # Handle slash commands
         @self.app.command("/cost-query")
@@ -101,13 +219,12 @@ class GCPCostSlackBot:
                     respond("Please provide a question. Example: `/cost-query Which services are most expensive?`")
                     return
                 
-                # Process the query
-                response = self._process_query(query)
-                respond(response)
+                # Answer on a worker thread
+                self._submit_query(query, respond)
                 
             except Exception as e:
-                logger.error(f"Error handling cost query: {e}")
-                respond("Sorry, I encountered an error processing your request. Please try again.")
+                logger.error("Error handling cost query: %s", e)
+                respond(_ERROR_REPLY)
         
         @self.app.command("/cost-stats")
         def handle_cost_stats(ack, respond):
@@ -125,49 +242,58 @@ class GCPCostSlackBot:
                     respond(f"❌ Error getting stats: {stats['error']}")
                     return
                 
-                response = f"""📊 *Cost Data Statistics:*
-• Total Documents: {stats['total_documents']}
-• Cost Data Records: {stats['cost_data_count']}
-• Anomaly Records: {stats['anomaly_data_count']}
-• Collections: {', '.join(stats['collections'])}"""
-                
-                respond(response)
+                respond(_STATS_TEMPLATE.format_map({**stats, 'collections': ', '.join(stats['collections'])}))
                 
             except Exception as e:
-                logger.error(f"Error handling cost stats: {e}")
+                logger.error("Error handling cost stats: %s", e)
                 respond("Sorry, I encountered an error getting statistics.")
         
         @self.app.command("/cost-help")
         def handle_help(ack, respond):
             """Handle /cost-help slash command"""
             ack()
+            respond(_HELP_TEXT)
+    
+    def _submit_query(self, query: str, reply, client=None):
+        """
+        Queue a query for a worker thread, which sends the answer with reply; with a
+        Web API client the answer is streamed by editing the posted message
+        """
+        if not self._pending_queries.acquire(blocking=False):
+            reply("⏳ I'm handling a lot of questions right now. Please try again in a moment.")
+            return
+        future = self._query_pool.submit(self._answer_query, query, reply, client)
+        future.add_done_callback(lambda _: self._pending_queries.release())
+    
+    def _answer_query(self, query: str, reply, client=None):
+        """Process a query and send the answer"""
+        msg = None
+        try:
+            if client is None:
+                reply(self._process_query(query))
+                return
             
-            help_text = """🤖 *GCP Cost Monitor Bot Help*
-
-*Commands:*
-• `/cost-query <question>` - Ask about your costs
-• `/cost-stats` - Get data statistics
-• `/cost-help` - Show this help
-
-*Example Questions:*
-• "Which services are most expensive?"
-• "Show me recent anomalies"
-• "What are the cost trends?"
-• "How much did we spend yesterday?"
-• "Which projects have the highest costs?"
-
-*Features:*
-• Real-time cost data analysis
-• Anomaly detection insights
-• Trend analysis
-• Service-level breakdowns
-
-*Tips:*
-• Be specific in your questions
-• Ask about specific services, projects, or time periods
-• Use natural language - I understand context!"""
-            
-            respond(help_text)
+            msg = reply("_thinking..._")
+            buf = []
+            size = last_sent = 0
+            for chunk in self._process_query_stream(query):
+                buf.append(chunk)
+                size += len(chunk)
+                if size - last_sent > self._STREAM_UPDATE_CHARS:
+                    client.chat_update(channel=msg['channel'], ts=msg['ts'], text=self._format_for_slack("".join(buf)))
+                    last_sent = size
+            if size != last_sent or not size:
+                # Slack rejects empty text, so an empty answer becomes the error reply
+                text = self._format_for_slack("".join(buf)) if "".join(buf).strip() else _ERROR_REPLY
+                client.chat_update(channel=msg['channel'], ts=msg['ts'], text=text)
+        except Exception as e:
+            logger.error("Error sending query response: %s", e)
+            # Don't leave the placeholder up
+            if msg is not None:
+                try:
+                    client.chat_update(channel=msg['channel'], ts=msg['ts'], text=_ERROR_REPLY)
+                except Exception as e:
+                    logger.error("Error replacing thinking message: %s", e)
     
     def _process_query(self, query: str) -> str:
         """
@@ -179,21 +305,62 @@ class GCPCostSlackBot:
         Returns:
             Formatted response string
         """
+        return self._format_for_slack("".join(self._process_query_stream(query)))
+    
+    def _process_query_stream(self, query: str) -> Iterator[str]:
+        """
+        Process a user query using RAG system, yielding the raw response in chunks
+        as it is generated; the joined chunks still need _format_for_slack
+        """
         if not self.rag:
-            return "❌ RAG system not available. Please check the configuration."
+            yield "❌ RAG system not available. Please check the configuration."
+            return
         
         try:
-            # Process the query
-            response = self.rag.process_query(query)
+            response = self.rag.cached_response(query)
+            if response is not None:
+                yield response
+                return
             
-            # Format for Slack (convert markdown to Slack format)
-            response = self._format_for_slack(response)
+            # Near-duplicate questions reuse an earlier answer; the embedding is
+            # passed on so a miss does not embed the query twice
+            key = _normalize_query(query)
+            try:
+                embedding = self.rag.embed(key)
+            except Exception as e:
+                logger.warning("Could not embed query for semantic cache: %s", e)
+                embedding = None
+            if embedding is not None:
+                response = self._semantic_cache.get_similar(embedding)
+                if response is not None:
+                    yield response
+                    return
+            
+            # Process the query
+            parts = []
+            cacheable = yield from tee_stream(self.rag.process_query_stream(query, query_embedding=embedding), parts)
             
-            return response
+            # No-data, fallback and empty answers are not cached, so the semantic tier can't spread them
+            if cacheable and embedding is not None:
+                self._semantic_cache.put(key, embedding, "".join(parts))
             
         except Exception as e:
-            logger.error(f"Error processing query: {e}")
-            return "Sorry, I encountered an error processing your request. Please try again."
+            logger.error("Error processing query: %s", e)
+            yield _ERROR_REPLY
+    
+    def _warmup(self):
+        """Check the Slack token and load the embedding model, vector store and LLM before real traffic"""
+        try:
+            self.app.client.auth_test()
+        except Exception as e:
+            logger.warning("Slack auth check failed during warmup: %s", e)
+        
+        if not self.rag:
+            return
+        start = time.perf_counter()
+        for query in _WARMUP_QUERIES:
+            self._process_query(query)
+        logger.info("Warmed up %d common queries in %.1fs", len(_WARMUP_QUERIES), time.perf_counter() - start)
     
     def _format_for_slack(self, text: str) -> str:
         """
@@ -205,30 +372,15 @@ class GCPCostSlackBot:
         Returns:
             Slack-formatted text
         """
-        # Convert markdown to Slack format
-        formatted = text
-        
-        # Bold text
-        formatted = formatted.replace('**', '*')
-        
-        # Lists
-        formatted = formatted.replace('\n• ', '\n• ')
-        formatted = formatted.replace('\n1. ', '\n1. ')
-        formatted = formatted.replace('\n2. ', '\n2. ')
-        formatted = formatted.replace('\n3. ', '\n3. ')
-        
-        # Code blocks
-        formatted = formatted.replace('`', '`')
-        
-        return formatted
+        return _SLACK_BOLD_RE.sub('*', text)
     
     def start(self):
         """Start the Slack bot"""
-        if not os.environ.get("SLACK_BOT_TOKEN"):
+        if not _BOT_TOKEN:
             logger.error("SLACK_BOT_TOKEN not found in environment variables")
             return
         
-        if not os.environ.get("SLACK_SIGNING_SECRET"):
+        if not _SIGNING_SECRET:
             logger.error("SLACK_SIGNING_SECRET not found in environment variables")
             return
         
@@ -240,12 +392,17 @@ class GCPCostSlackBot:
         logger.info("  • /cost-stats command")
         logger.info("  • /cost-help command")
         
+        # Warm up in the background so the socket connection is not delayed
+        threading.Thread(target=self._warmup, name="slack-warmup", daemon=True).start()
+        
         # Start the bot
-        handler = SocketModeHandler(self.app, os.environ.get("SLACK_APP_TOKEN"))
+        handler = SocketModeHandler(self.app, _APP_TOKEN)
         handler.start()
 
 def main():
     """Main function to run the Slack bot"""
+    # Configure logging here rather than at import, so embedding the bot keeps the host's log level
+    logging.basicConfig(level=logging.INFO)
     bot = GCPCostSlackBot()
     bot.start()
 
@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+"""
+SQLite bootstrap for the Slack bot
+Swaps in pysqlite3 for the stdlib sqlite3 before Chroma is imported
+"""
+
+import os
+import sys
+
+# Disable CoreML to fix ONNX Runtime issues on macOS
+os.environ.setdefault('ONNXRUNTIME_PROVIDER', 'CPUExecutionProvider')
+os.environ.setdefault('ONNXRUNTIME_DISABLE_COREML', '1')
+
+# Only swap before anything has imported sqlite3, otherwise the swap is partial;
+# the launchers report which module ended up installed
+if 'sqlite3' not in sys.modules:
+    try:
+        import pysqlite3
+        sys.modules['sqlite3'] = pysqlite3
+    except ImportError:
+        pass
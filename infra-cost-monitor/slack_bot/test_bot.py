@@ -11,6 +11,9 @@ from slack_sdk.errors import SlackApiError
 
 # Load environment variables
 load_dotenv()
+_BOT_TOKEN = os.environ.get("SLACK_BOT_TOKEN")
+_SIGNING_SECRET = os.environ.get("SLACK_SIGNING_SECRET")
+_APP_TOKEN = os.environ.get("SLACK_APP_TOKEN")
 
 def test_slack_connection():
     """Test Slack API connection"""
@@ -18,23 +21,19 @@ def test_slack_connection():
     print()
     
     # Check environment variables
-    bot_token = os.environ.get("SLACK_BOT_TOKEN")
-    signing_secret = os.environ.get("SLACK_SIGNING_SECRET")
-    app_token = os.environ.get("SLACK_APP_TOKEN")
-    
     print("📋 Environment Variables:")
-    print(f"   SLACK_BOT_TOKEN: {'✅ Set' if bot_token else '❌ Missing'}")
-    print(f"   SLACK_SIGNING_SECRET: {'✅ Set' if signing_secret else '❌ Missing'}")
-    print(f"   SLACK_APP_TOKEN: {'✅ Set' if app_token else '❌ Missing'}")
+    print(f"   SLACK_BOT_TOKEN: {'✅ Set' if _BOT_TOKEN else '❌ Missing'}")
+    print(f"   SLACK_SIGNING_SECRET: {'✅ Set' if _SIGNING_SECRET else '❌ Missing'}")
+    print(f"   SLACK_APP_TOKEN: {'✅ Set' if _APP_TOKEN else '❌ Missing'}")
     print()
     
-    if not bot_token:
+    if not _BOT_TOKEN:
         print("❌ SLACK_BOT_TOKEN not found!")
         return False
     
     # Test API connection
     try:
-        client = WebClient(token=bot_token)
+        client = WebClient(token=_BOT_TOKEN)
         response = client.auth_test()
         
         print("✅ Slack API Connection Successful!")
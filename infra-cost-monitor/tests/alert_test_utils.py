@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+"""
+Alert Test Utilities
+Shared alert config for the alert test scripts; import after alert_system is on sys.path
+"""
+
+import os
+
+from alert_manager import AlertConfig
+
+# Alert configuration from the environment, built once at import
+ALERT_CONFIG = AlertConfig(
+    slack_webhook_url=os.getenv("SLACK_WEBHOOK_URL", ""),
+    email_smtp_server="smtp.gmail.com",
+    email_smtp_port=587,
+    email_username=os.getenv("EMAIL_USERNAME", ""),
+    email_password=os.getenv("EMAIL_PASSWORD", ""),
+    email_recipients=[],
+    escalation_recipients=[],
+    alert_cooldown_minutes=30,
+    max_alerts_per_hour=10
+)
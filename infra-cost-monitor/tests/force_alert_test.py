@@ -4,17 +4,13 @@ Force Alert Test
 Test if Slack webhook is working by sending a test alert
 """
 
-import json
-import requests
-import os
+from webhook_utils import load_alert_config, post_json
 
 def test_slack_webhook():
     """Test Slack webhook directly"""
     
     # Load config
-    config_file = "alert_system/config.json"
-    with open(config_file, 'r') as f:
-        config = json.load(f)
+    config = load_alert_config()
     
     webhook_url = config.get("slack_webhook_url", "")
     
@@ -32,11 +28,7 @@ def test_slack_webhook():
     }
     
     try:
-        response = requests.post(
-            webhook_url,
-            json=test_message,
-            timeout=10
-        )
+        response = post_json(webhook_url, test_message)
         
         if response.status_code == 200:
             print("✅ Test message sent successfully!")
@@ -4,14 +4,30 @@ Direct Alert Test
 Bypasses ChromaDB and directly tests alert system with current anomaly data
 """
 
-import json
 import os
 import sys
 from datetime import datetime
+from typing import Any, Dict, Tuple
 
 # Add alert system to path
 sys.path.append('../alert_system')
-from alert_manager import AlertManager, AlertConfig
+from alert_manager import AlertManager, read_json
+from alert_test_utils import ALERT_CONFIG
+
+def _anomaly_fields(anomaly: Dict[str, Any]) -> Tuple[str, float, float, str, str, str]:
+    """(service, anomaly_score, cost_impact, description, severity, timestamp), supporting both old and new formats"""
+    if 'percentage_diff' in anomaly:
+        anomaly_score = anomaly['percentage_diff'] / 100
+    else:
+        anomaly_score = anomaly.get('anomaly_score', 1.0)
+    return (
+        anomaly.get('service_desc') or anomaly.get('service', 'unknown'),
+        anomaly_score,
+        anomaly.get('cost_impact', 0),
+        anomaly.get('description', ''),
+        anomaly.get('severity', 'medium'),
+        anomaly.get('timestamp') or anomaly.get('detected_at', '')
+    )
 
 def test_alerts_direct():
     """Test alerts directly without ChromaDB"""
@@ -25,53 +41,18 @@ def test_alerts_direct():
         print("❌ No anomalies.json found")
         return
     
-    with open(anomalies_file, 'r') as f:
-        anomalies = json.load(f)
+    anomalies = read_json(anomalies_file)
+    records = [_anomaly_fields(anomaly) for anomaly in anomalies]
     
     print(f"📊 Found {len(anomalies)} anomalies")
     
     # Initialize alert manager
-    config_data = {
-        "slack_webhook_url": os.getenv("SLACK_WEBHOOK_URL", ""),
-        "email_smtp_server": "smtp.gmail.com",
-        "email_smtp_port": 587,
-        "email_username": os.getenv("EMAIL_USERNAME", ""),
-        "email_password": os.getenv("EMAIL_PASSWORD", ""),
-        "email_recipients": [],
-        "escalation_recipients": [],
-        "alert_cooldown_minutes": 30,
-        "max_alerts_per_hour": 10
-    }
-    
-    config = AlertConfig(**config_data)
-    alert_manager = AlertManager(config)
+    alert_manager = AlertManager(ALERT_CONFIG)
     
     print("✅ Alert manager initialized")
     
-    # Test each anomaly
-    for i, anomaly in enumerate(anomalies):
-        print(f"\n🔍 Testing Anomaly {i+1}:")
-        print(f"   Raw anomaly: {anomaly}")
-        
-        # Support both old and new formats
-        service = anomaly.get('service_desc') or anomaly.get('service', 'unknown')
-        if 'percentage_diff' in anomaly:
-            anomaly_score = anomaly.get('percentage_diff', 100) / 100
-        elif 'anomaly_score' in anomaly:
-            anomaly_score = anomaly.get('anomaly_score', 1.0)
-        else:
-            anomaly_score = 1.0
-        cost_impact = anomaly.get('cost_impact', 0)
-        description = anomaly.get('description', '')
-        severity = anomaly.get('severity', 'medium')
-        timestamp = anomaly.get('timestamp') or anomaly.get('detected_at', '')
-        
-        print(f"   Service: {service}")
-        print(f"   Cost Impact: ₹{cost_impact:.2f}")
-        print(f"   Anomaly Score: {anomaly_score:.2f}")
-        print(f"   Severity: {severity}")
-        
-        anomaly_data = {
+    anomaly_rows = [
+        {
             'service': service,
             'anomaly_score': anomaly_score,
             'cost_impact': cost_impact,
@@ -79,28 +60,52 @@ def test_alerts_direct():
             'severity': severity,
             'timestamp': timestamp
         }
+        for service, anomaly_score, cost_impact, description, severity, timestamp in records
+    ]
+    
+    # Check all anomalies against the thresholds in one pass
+    alerts = alert_manager.check_anomalies_batch(anomaly_rows)
+    
+    # Test each anomaly; each report is written in one call rather than line by line
+    for i, (anomaly, record, alert) in enumerate(zip(anomalies, records, alerts)):
+        service, anomaly_score, cost_impact, description, severity, timestamp = record
         
-        # Check if alert should be triggered
-        print(f"   🔍 Checking anomaly against thresholds...")
-        print(f"   📊 Cost impact: {cost_impact} vs threshold: 1.0")
-        print(f"   🎯 Service: '{service}' vs threshold service: 'all'")
-        
-        alert = alert_manager.check_anomaly(anomaly_data)
+        lines = [
+            f"\n🔍 Testing Anomaly {i+1}:",
+            f"   Raw anomaly: {anomaly}",
+            f"   Service: {service}",
+            f"   Cost Impact: ₹{cost_impact:.2f}",
+            f"   Anomaly Score: {anomaly_score:.2f}",
+            f"   Severity: {severity}",
+            # Check if alert should be triggered
+            "   🔍 Checking anomaly against thresholds...",
+            f"   📊 Cost impact: {cost_impact} vs threshold: 1.0",
+            f"   🎯 Service: '{service}' vs threshold service: 'all'"
+        ]
         
         if alert:
-            print(f"   🚨 ALERT TRIGGERED!")
-            print(f"   Alert Type: {alert['type']}")
-            print(f"   Severity: {alert['severity']}")
+            lines += [
+                "   🚨 ALERT TRIGGERED!",
+                f"   Alert Type: {alert['type']}",
+                f"   Severity: {alert['severity']}"
+            ]
             
             # Send alert
             success = alert_manager.send_alert(alert)
             if success:
-                print(f"   ✅ Alert sent successfully to Slack")
+                lines.append("   ✅ Alert queued for delivery to Slack")
             else:
-                print(f"   ❌ Failed to send alert")
+                lines.append("   ❌ Alert not queued (cooldown, rate limit or full queue)")
         else:
-            print(f"   ⏭️  No alert triggered (below threshold)")
-            print(f"   🔍 Debug: anomaly_score={anomaly_score}, cost_impact={cost_impact}")
+            lines += [
+                "   ⏭️  No alert triggered (below threshold)",
+                f"   🔍 Debug: anomaly_score={anomaly_score}, cost_impact={cost_impact}"
+            ]
+        
+        print("\n".join(lines))
+    
+    # Deliver the queued alerts and save the cooldown state
+    alert_manager.shutdown()
     
     print(f"\n🎯 Test completed!")
     print(f"📊 Check your Slack channel for alerts")
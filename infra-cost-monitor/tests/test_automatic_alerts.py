@@ -6,13 +6,13 @@ Demonstrates how anomalies automatically trigger Slack alerts
 
 import os
 import sys
-import json
 import logging
 from datetime import datetime
 
 # Add alert system to path
 sys.path.append('./alert_system')
-from alert_manager import AlertManager, AlertConfig
+from alert_manager import ALERT_HISTORY_FILE, AlertManager, read_json, SentAlertCache
+from alert_test_utils import ALERT_CONFIG
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -30,38 +30,26 @@ def test_automatic_alerts():
         print("❌ No anomalies.json found. Run mock_data_generator.py first.")
         return
     
-    with open(anomalies_file, 'r') as f:
-        anomalies = json.load(f)
+    anomalies = read_json(anomalies_file)
     
     print(f"📊 Found {len(anomalies)} anomalies to test")
     
-    # Initialize alert manager
-    config_data = {
-        "slack_webhook_url": os.getenv("SLACK_WEBHOOK_URL", ""),
-        "email_smtp_server": "smtp.gmail.com",
-        "email_smtp_port": 587,
-        "email_username": os.getenv("EMAIL_USERNAME", ""),
-        "email_password": os.getenv("EMAIL_PASSWORD", ""),
-        "email_recipients": [],
-        "escalation_recipients": [],
-        "alert_cooldown_minutes": 30,
-        "max_alerts_per_hour": 10
-    }
+    # Skip anomalies already alerted on in an earlier run over the same file
+    sent = SentAlertCache(anomalies_file)
+    pairs = [(anomaly.get('service_desc', 'unknown'), anomaly.get('timestamp') or anomaly.get('date', ''))
+             for anomaly in anomalies]
+    pending = [(anomaly, pair) for anomaly, pair in zip(anomalies, pairs) if pair not in sent]
+    if len(pending) < len(anomalies):
+        print(f"⏭️  Skipping {len(anomalies) - len(pending)} anomalies already alerted on")
     
-    config = AlertConfig(**config_data)
-    alert_manager = AlertManager(config)
+    # Initialize alert manager
+    alert_manager = AlertManager(ALERT_CONFIG)
     
     print("✅ Alert manager initialized")
     
-    # Test each anomaly
-    for i, anomaly in enumerate(anomalies):
-        print(f"\n🔍 Testing Anomaly {i+1}:")
-        print(f"   Service: {anomaly.get('service_desc', 'unknown')}")
-        print(f"   Cost Impact: ₹{anomaly.get('cost_impact', 0):.2f}")
-        print(f"   Severity: {anomaly.get('severity', 'medium')}")
-        
-        # Prepare anomaly data
-        anomaly_data = {
+    # Prepare anomaly data
+    anomaly_rows = [
+        {
             'service': anomaly.get('service_desc', 'unknown'),
             'anomaly_score': anomaly.get('percentage_diff', 0) / 100,
             'cost_impact': anomaly.get('cost_impact', 0),
@@ -69,27 +57,40 @@ def test_automatic_alerts():
             'severity': anomaly.get('severity', 'medium'),
             'timestamp': anomaly.get('timestamp', datetime.now().isoformat())
         }
-        
-        # Check if alert should be triggered
-        alert = alert_manager.check_anomaly(anomaly_data)
+        for anomaly, _ in pending
+    ]
+    
+    # Check all anomalies against the thresholds in one pass
+    alerts = alert_manager.check_anomalies_batch(anomaly_rows)
+    
+    # Test each anomaly
+    for i, ((anomaly, pair), alert) in enumerate(zip(pending, alerts)):
+        print(f"\n🔍 Testing Anomaly {i+1}:")
+        print(f"   Service: {anomaly.get('service_desc', 'unknown')}")
+        print(f"   Cost Impact: ₹{anomaly.get('cost_impact', 0):.2f}")
+        print(f"   Severity: {anomaly.get('severity', 'medium')}")
         
         if alert:
             print(f"   🚨 ALERT TRIGGERED!")
             print(f"   Alert Type: {alert['type']}")
             print(f"   Severity: {alert['severity']}")
             
-            # Send alert
-            success = alert_manager.send_alert(alert)
+            # Send alert; remembered only once delivery succeeds, so failed alerts are retried next run
+            success = alert_manager.send_alert(alert, on_delivered=lambda _, pair=pair: sent.add(pair))
             if success:
-                print(f"   ✅ Alert sent successfully to Slack")
+                print(f"   ✅ Alert queued for delivery to Slack")
             else:
                 print(f"   ❌ Failed to send alert")
         else:
             print(f"   ⏭️  No alert triggered (below threshold)")
     
+    # Wait for the queued alerts to be delivered before recording them
+    alert_manager.shutdown()
+    sent.save()
+    
     print(f"\n🎯 Test completed!")
     print(f"📊 Check your Slack channel for alerts")
-    print(f"📁 Alert history saved to: alert_system/alert_history.json")
+    print(f"📁 Alert history saved to: {ALERT_HISTORY_FILE}")
 
 if __name__ == "__main__":
     test_automatic_alerts() 
\ No newline at end of file
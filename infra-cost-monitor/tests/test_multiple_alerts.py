@@ -5,11 +5,22 @@ Send multiple anomaly alerts to test the improved delay system
 """
 
 import json
-import time
 from alert_system.alert_manager import AlertManager, AlertConfig
 
+# Test anomaly alerts; static, so built once at import
+TEST_ANOMALIES = (
+    {"service": "Compute Engine", "anomaly_score": 1.0, "cost_impact": 9.34},
+    {"service": "BigQuery", "anomaly_score": 1.0, "cost_impact": 7.96},
+    {"service": "Cloud SQL", "anomaly_score": 1.0, "cost_impact": 4.62},
+    {"service": "Kubernetes Engine", "anomaly_score": 1.0, "cost_impact": 11.48},
+    {"service": "Cloud Functions", "anomaly_score": 1.0, "cost_impact": 2.51},
+    {"service": "Cloud Storage", "anomaly_score": 1.0, "cost_impact": 1.75},
+    {"service": "Pub/Sub", "anomaly_score": 1.0, "cost_impact": 2.76},
+    {"service": "Cloud Run", "anomaly_score": 1.0, "cost_impact": 2.65}
+)
+
 def test_multiple_alerts():
-    """Test sending multiple alerts with delays"""
+    """Test queueing a burst of alerts, which the alert manager coalesces into one Slack message"""
     
     # Load config
     config_file = "alert_system/config.json"
@@ -21,39 +32,31 @@ def test_multiple_alerts():
     
     print("🚨 Test Multiple Alerts")
     print("=" * 40)
-    print("Sending 8 anomaly alerts with 1-second delays...")
+    print(f"Queueing {len(TEST_ANOMALIES)} anomaly alerts...")
     print()
     
-    # Test anomaly alerts
-    test_anomalies = [
-        {"service": "Compute Engine", "anomaly_score": 1.0, "cost_impact": 9.34},
-        {"service": "BigQuery", "anomaly_score": 1.0, "cost_impact": 7.96},
-        {"service": "Cloud SQL", "anomaly_score": 1.0, "cost_impact": 4.62},
-        {"service": "Kubernetes Engine", "anomaly_score": 1.0, "cost_impact": 11.48},
-        {"service": "Cloud Functions", "anomaly_score": 1.0, "cost_impact": 2.51},
-        {"service": "Cloud Storage", "anomaly_score": 1.0, "cost_impact": 1.75},
-        {"service": "Pub/Sub", "anomaly_score": 1.0, "cost_impact": 2.76},
-        {"service": "Cloud Run", "anomaly_score": 1.0, "cost_impact": 2.65}
-    ]
+    # Check all anomalies against the thresholds in one pass
+    alerts = alert_manager.check_anomalies_batch(TEST_ANOMALIES)
     
-    for i, anomaly in enumerate(test_anomalies, 1):
-        print(f"📤 Sending alert {i}/8 for {anomaly['service']}...")
+    for i, (anomaly, alert) in enumerate(zip(TEST_ANOMALIES, alerts), 1):
+        print(f"📤 Queueing alert {i}/{len(TEST_ANOMALIES)} for {anomaly['service']}...")
         
-        alert = alert_manager.check_anomaly(anomaly)
         if alert:
             success = alert_manager.send_alert(alert)
             if success:
-                print(f"✅ Alert {i} sent successfully")
+                print(f"✅ Alert {i} queued for delivery")
             else:
-                print(f"❌ Alert {i} failed to send")
+                print(f"❌ Alert {i} not queued (cooldown, rate limit or full queue)")
         else:
-            print(f"⚠️ Alert {i} not triggered (threshold not met)")
+            print(f"⚠️ Alert {i} not triggered (below threshold or in cooldown)")
         
         print()
     
+    # Deliver the queued alerts and save the cooldown state
+    alert_manager.shutdown()
+    
     print("🎯 Test completed!")
-    print("📱 Check your Slack channel for all 8 alerts")
-    print("⏱️ Each alert should have a 1-second delay between them")
+    print("📱 Check your Slack channel: alerts queued within 0.5s arrive together as one message")
 
 if __name__ == "__main__":
     test_multiple_alerts() 
\ No newline at end of file
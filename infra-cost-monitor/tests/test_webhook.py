@@ -4,17 +4,13 @@ Test Slack Webhook
 Simple script to test if your Slack webhook is working
 """
 
-import json
-import requests
-import os
+from webhook_utils import load_alert_config, post_json
 
 def test_slack_webhook():
     """Test the Slack webhook configuration"""
     
     # Load config
-    config_file = "alert_system/config.json"
-    with open(config_file, 'r') as f:
-        config = json.load(f)
+    config = load_alert_config()
     
     webhook_url = config.get("slack_webhook_url", "")
     
@@ -33,7 +29,7 @@ def test_slack_webhook():
     }
     
     try:
-        response = requests.post(webhook_url, json=test_message, timeout=10)
+        response = post_json(webhook_url, test_message)
         
         if response.status_code == 200:
             print("✅ Webhook test successful!")
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Webhook Utilities
+Shared HTTP session and alert config for the Slack webhook test scripts
+"""
+
+import os
+import sys
+from functools import lru_cache
+from typing import Any, Dict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Shared JSON helpers (orjson when installed)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from json_utils import dumps, read_json
+
+_JSON_HEADERS = {'Content-Type': 'application/json'}
+
+def _create_session() -> requests.Session:
+    """Create a session that keeps the webhook connection alive and retries transient failures"""
+    retry = Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=frozenset({'POST'})  # Webhook posts are not retried by default
+    )
+    session = requests.Session()
+    session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=retry))
+    return session
+
+# One pooled session per process, so repeated posts reuse the TCP/TLS connection
+SESSION = _create_session()
+
+def post_json(url: str, payload: Any, timeout: float = 10) -> requests.Response:
+    """POST a payload (dict or pre-serialized bytes) as JSON over the shared session"""
+    body = payload if isinstance(payload, bytes) else dumps(payload)
+    return SESSION.post(url, data=body, headers=_JSON_HEADERS, timeout=timeout)
+
+@lru_cache(maxsize=1)
+def load_alert_config(config_file: str = "alert_system/config.json") -> Dict[str, Any]:
+    """Parse the alert config once per process"""
+    return read_json(config_file)
@@ -7,13 +7,14 @@ Reads anomalies from the mock data and triggers alerts
 import json
 import os
 import sys
-import time
 from datetime import datetime
 
 # Add the alert_system directory to the path
 sys.path.append('alert_system')
 
-from alert_manager import AlertManager, AlertConfig
+from alert_manager import AlertManager, AlertConfig, read_json, SentAlertCache
+
+ANOMALIES_FILE = "mock-data/output/anomalies.json"
 
 def load_config():
     """Load alert configuration"""
@@ -29,15 +30,11 @@ def load_config():
 
 def load_anomalies():
     """Load anomalies from the mock data output"""
-    anomalies_file = "mock-data/output/anomalies.json"
-    if not os.path.exists(anomalies_file):
-        print(f"Anomalies file {anomalies_file} not found")
+    if not os.path.exists(ANOMALIES_FILE):
+        print(f"Anomalies file {ANOMALIES_FILE} not found")
         return []
     
-    with open(anomalies_file, 'r') as f:
-        anomalies = json.load(f)
-    
-    return anomalies
+    return read_json(ANOMALIES_FILE)
 
 def trigger_alerts():
     """Trigger alerts for all anomalies"""
@@ -60,29 +57,39 @@ def trigger_alerts():
     
     print(f"📊 Found {len(anomalies)} anomalies to process")
     
+    # Skip anomalies already alerted on in an earlier run over the same file
+    sent = SentAlertCache(ANOMALIES_FILE)
+    pending = [anomaly for anomaly in anomalies if (anomaly['service'], anomaly['date']) not in sent]
+    if len(pending) < len(anomalies):
+        print(f"⏭️  Skipping {len(anomalies) - len(pending)} anomalies already alerted on")
+    
+    # Check all anomalies against the thresholds in one pass
+    alerts = alert_manager.check_anomalies_batch(pending)
+    
     # Process each anomaly
-    for i, anomaly in enumerate(anomalies, 1):
-        print(f"\n🔍 Processing anomaly {i}/{len(anomalies)}:")
+    for i, (anomaly, alert) in enumerate(zip(pending, alerts), 1):
+        print(f"\n🔍 Processing anomaly {i}/{len(pending)}:")
         print(f"   Service: {anomaly['service']}")
         print(f"   Date: {anomaly['date']}")
         print(f"   Cost Impact: ₹{anomaly['cost_impact']:.2f}")
         print(f"   Description: {anomaly['description']}")
         
-        # Check if this anomaly should trigger an alert
-        alert = alert_manager.check_anomaly(anomaly)
-        
         if alert:
             print(f"   ✅ Alert triggered!")
-            success = alert_manager.send_alert(alert)
+            # Remembered only once delivery succeeds, so failed alerts are retried next run
+            pair = (anomaly['service'], anomaly['date'])
+            success = alert_manager.send_alert(alert, on_delivered=lambda _, pair=pair: sent.add(pair))
             if success:
-                print(f"   📤 Alert sent successfully")
+                print(f"   📤 Alert queued for delivery")
             else:
                 print(f"   ❌ Failed to send alert")
         else:
             print(f"   ⚠️  No alert triggered (below threshold)")
-        
-        # Small delay between processing
-        time.sleep(1)
+    
+    # The alert manager paces webhook posts itself; wait for the queue to drain
+    print("\n📤 Delivering queued alerts...")
+    alert_manager.shutdown()
+    sent.save()
     
     print(f"\n🎉 Finished processing {len(anomalies)} anomalies")
 